@@ -1,70 +1,140 @@
+import time
 from app.agent import steps, prompts
-from app.services.vector_service import vector_service
-from app.services.llm_service import llm_service
+from app.core import profiling
+from app.services.graph import ServiceGraph, service_graph
+from app.services.retrieval_plan import filter_equalities
 
-async def process_user_query_stream(user_query: str, chat_history: list, manual_filters: dict = None):
-    # 0. Context Prep
-    history_txt = "\n".join([f"{msg.role}: {msg.content}" for msg in chat_history[-4:]]) if chat_history else ""
+def _routing_filters(routing_meta: dict):
+    conditions = []
+    if routing_meta.get("chapter"): conditions.append({"chapter": routing_meta["chapter"]})
+    if routing_meta.get("section"): conditions.append({"section": routing_meta["section"]})
+    if routing_meta.get("vachanamrut_no"): conditions.append({"vachanamrut_no": int(routing_meta["vachanamrut_no"])})
+
+    if len(conditions) == 1: return conditions[0]
+    elif len(conditions) > 1: return {"$and": conditions}
+    return None
+
+async def process_user_query_stream(user_query: str, chat_history: list, manual_filters: dict = None, conversation_id: str = None, services: ServiceGraph = None, remember: bool = True):
+    """Yields the /ask chunks. `remember=False` leaves the session store untouched (one-off callers)."""
+    services = services or service_graph
+    llm_service = services.llm
+    vector_service = services.vectors
+    session_store = services.sessions
+    answer_cache = services.answers
+
+    # 0. Context Prep (server-side session wins over client-sent history)
+    session = session_store.get(conversation_id)
+    conversation_id = conversation_id or session_store.new_id()
+    yield {"type": "session", "data": {"conversation_id": conversation_id}}
+
+    if session:
+        history = session["history"]
+    else:
+        history = [{"role": msg.role, "content": msg.content} for msg in chat_history or []]
+    history_txt = "\n".join([f"{msg['role']}: {msg['content']}" for msg in history[-4:]])
+
+    # A follow-up ("explain this further") reuses the previous turn's routing and passages
+    reuse = bool(session and session["passages"]["documents"] and not manual_filters
+                 and steps.is_follow_up(user_query))
     
     yield {"type": "thought", "data": "🧠 Analyzing your question..."}
 
     # 1. Detect Language
-    lang = await steps.detect_language(user_query)
+    with profiling.stage("detect_language"):
+        lang = await steps.detect_language(user_query, llm=llm_service)
     yield {"type": "thought", "data": f"🌍 Detected Language: {lang}"}
 
     # 2. Route
-    routing_meta = await steps.route_query(user_query, history_txt)
+    if reuse:
+        routing_meta = session["routing_meta"]
+        yield {"type": "thought", "data": "🔁 Continuing from the previous answer..."}
+    else:
+        with profiling.stage("route_query"):
+            routing_meta = await steps.route_query(user_query, history_txt, llm=llm_service)
     if routing_meta:
         yield {"type": "thought", "data": f"🧠 Understanding Context: {routing_meta}"}
 
+    final_where = manual_filters or (_routing_filters(routing_meta) if routing_meta else None)
+
+    # 2b. Precomputed Summary (one discourse + summary intent -> no answer LLM call)
+    if not reuse and steps.is_summary_request(user_query) and vector_service.plan(final_where) == "direct":
+        fields = filter_equalities(final_where)
+        discourse = services.corpus.get_full_text(fields["chapter"], fields.get("section", ""), fields["vachanamrut_no"])
+        summary = services.summaries.get(discourse, lang) if discourse else None
+        if summary:
+            yield {"type": "thought", "data": "📜 Serving precomputed summary..."}
+            answer = services.summaries.render(summary, lang)
+            yield {"type": "citation", "data": [
+                {"text": summary["summary"][:100]+"...", "metadata": {
+                    "chapter": discourse.get("chapter"),
+                    "section": discourse.get("section"),
+                    "vachanamrut_no": discourse.get("vachanamrut_no")
+                }}
+            ]}
+            yield {"type": "token", "data": answer}
+            if remember: session_store.save(
+                conversation_id,
+                history=history + [
+                    {"role": "user", "content": user_query},
+                    {"role": "assistant", "content": answer}
+                ],
+                routing_meta=routing_meta,
+                language=lang,
+                passages={"ids": [], "documents": [], "metadatas": []}
+            )
+            return
+
     # 3. Translate
     translated_query = user_query
     if lang != "en":
         yield {"type": "thought", "data": "🌐 Translating for Search..."}
-        translated_query = await steps.translate_query(user_query)
+        with profiling.stage("translate_query"):
+            translated_query = await steps.translate_query(user_query, llm=llm_service, translator=services.translator)
 
     # 4. Rewrite
-    search_query = await steps.rewrite_query(translated_query, routing_meta)
-    yield {"type": "thought", "data": "✏️ Searching Scripture..."}
-
-    # 5. Search
-    final_where = None
-    if manual_filters:
-        final_where = manual_filters
-    elif routing_meta:
-        conditions = []
-        if routing_meta.get("chapter"): conditions.append({"chapter": routing_meta["chapter"]})
-        if routing_meta.get("section"): conditions.append({"section": routing_meta["section"]})
-        if routing_meta.get("vachanamrut_no"): conditions.append({"vachanamrut_no": int(routing_meta["vachanamrut_no"])})
-        
-        if len(conditions) == 1: final_where = conditions[0]
-        elif len(conditions) > 1: final_where = {"$and": conditions}
+    with profiling.stage("rewrite_query"):
+        search_query = await steps.rewrite_query(translated_query, routing_meta, llm=llm_service)
 
-    if not vector_service.collection:
-        yield {"type": "error", "data": "Database not ready."}
-        return
+    if reuse:
+        final_ids = session["passages"]["ids"]
+        final_docs = session["passages"]["documents"]
+        final_metas = session["passages"]["metadatas"]
+    else:
+        yield {"type": "thought", "data": "✏️ Searching Scripture..."}
 
-    results = vector_service.search(search_query, filters=final_where)
+        # 5. Search
+        if not vector_service.collection:
+            yield {"type": "error", "data": "Database not ready."}
+            return
 
-    if not results or not results['documents'] or not results['documents'][0]:
-        yield {"type": "token", "data": "I could not find relevant Vachanamruts."}
-        return
+        with profiling.stage("vector_search"):
+            results = vector_service.search(search_query, filters=final_where)
+        if results:
+            yield {"type": "thought", "data": f"🔎 Retrieval Plan: {results['plan']}"}
 
-    # 6. Rerank
-    documents = results['documents'][0]
-    metadatas = results['metadatas'][0]
-    
-    yield {"type": "thought", "data": "📊 Ranking Results..."}
-    ranked_indices = await steps.rerank_passages(search_query, documents)
+        if not results or not results['documents'] or not results['documents'][0]:
+            yield {"type": "token", "data": "I could not find relevant Vachanamruts."}
+            return
 
-    final_docs = []
-    final_metas = []
-    indices_to_use = ranked_indices if ranked_indices else range(len(documents))
-    
-    for i in indices_to_use:
-        if i < len(documents):
-            final_docs.append(documents[i])
-            final_metas.append(metadatas[i])
+        # 6. Rerank
+        ids = results['ids'][0]
+        documents = results['documents'][0]
+        metadatas = results['metadatas'][0]
+        
+        yield {"type": "thought", "data": "📊 Ranking Results..."}
+        with profiling.stage("rerank_passages"):
+            ranked_indices = await steps.rerank_passages(search_query, documents, llm=llm_service)
+
+        final_ids = []
+        final_docs = []
+        final_metas = []
+        indices_to_use = ranked_indices if ranked_indices else range(len(documents))
+        
+        for i in indices_to_use:
+            if i < len(documents):
+                final_ids.append(ids[i])
+                final_docs.append(documents[i])
+                final_metas.append(metadatas[i])
     
     context_text = "\n\n".join(final_docs)
 
@@ -76,19 +146,62 @@ async def process_user_query_stream(user_query: str, chat_history: list, manual_
     # 7. Answer Stream
     yield {"type": "thought", "data": "💡 Generating Answer..."}
 
-    prompt = prompts.FINAL_ANSWER.format(
+    messages = prompts.build_messages(
+        "final_answer",
         context_text=context_text,
         query=search_query,
         language=lang
     )
 
-    try:
+    served = {}
+
+    async def generate():
         stream = await llm_service.generate_response(
-            messages=[{"role": "user", "content": prompt}],
-            stream=True
+            messages=messages,
+            stream=True,
+            template="final_answer"
         )
-        for chunk in stream:
-            if chunk.choices[0].delta.content:
-                yield {"type": "token", "data": chunk.choices[0].delta.content}
+        served["model"] = getattr(stream, "model", None)
+        chunks = llm_service.iterate_stream(stream)
+        try:
+            async for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Runs on cancellation too, so the provider stops generating
+            await chunks.aclose()
+
+    # Identical (passages, query, language, model) share one stream / cached answer.
+    # A fallback provider's answer is streamed but not stored under the primary model's key.
+    cache_key = answer_cache.key(final_ids, search_query, lang, llm_service.primary_model)
+    tokens = answer_cache.stream(
+        cache_key, generate,
+        cacheable=lambda: served.get("model") == llm_service.primary_model
+    )
+    answer = []
+    answer_started = time.perf_counter()
+    try:
+        async for token in tokens:
+            if not answer:
+                profiling.add("answer_first_token", time.perf_counter() - answer_started)
+            answer.append(token)
+            yield {"type": "token", "data": token}
+        profiling.add("answer_stream", time.perf_counter() - answer_started)
     except Exception as e:
         yield {"type": "error", "data": str(e)}
+        return
+    finally:
+        # Leaving early (client gone) unsubscribes from the shared stream
+        await tokens.aclose()
+
+    # 8. Remember this turn for follow-ups
+    if remember: session_store.save(
+        conversation_id,
+        history=history + [
+            {"role": "user", "content": user_query},
+            {"role": "assistant", "content": "".join(answer)}
+        ],
+        routing_meta=routing_meta,
+        language=lang,
+        passages={"ids": final_ids, "documents": final_docs, "metadatas": final_metas}
+    )
@@ -1,21 +1,28 @@
-DETECT_LANGUAGE = """
-Detect the language of the following user query.
+# Every prompt is split into a static SYSTEM prefix and a dynamic USER suffix.
+# The system part never changes between calls, so providers can reuse its
+# cached prefix (Groq prompt caching, Gemini cached content); all variable
+# parts (query, history, context) go at the end, in the user message.
+
+DETECT_LANGUAGE_SYSTEM = """
+Detect the language of the user query.
 
 Supported languages:
 - English → en
 - Hindi → hi
 - Gujarati → gu
 
-User Query:
-{user_query}
-
 Output JSON ONLY:
-{{ "language": "en" }}
+{ "language": "en" }
 
 Deterministic. No creativity.
 """
 
-ROUTE_QUERY = """
+DETECT_LANGUAGE_USER = """
+User Query:
+{user_query}
+"""
+
+ROUTE_QUERY_SYSTEM = """
 You are a scripture routing assistant.
 
 Your task is to determine whether the user is referring to a specific
@@ -26,12 +33,6 @@ Use:
 - The conversation history
 - Cultural and scripture-specific phrasing
 
-Conversation History:
-{history_context}
-
-User Query:
-{user_query}
-
 Valid Chapters:
 Gadhada, Sarangpur, Kariyani, Loya, Panchala, Vartal, Amdavad, Jetalpur, Ashlali
 
@@ -44,18 +45,26 @@ infer the correct Vachanamrut from history.
 - If no specific discourse is referenced, return empty JSON.
 
 Output JSON ONLY:
-{{
+{
 "chapter": "Gadhada",
 "section": "I",
 "vachanamrut_no": 16
-}}
+}
 
 OR:
-{{}}
+{}
+"""
+
+ROUTE_QUERY_USER = """
+Conversation History:
+{history_context}
+
+User Query:
+{user_query}
 """
 
-TRANSLATE_QUERY = """
-Translate the following text into English.
+TRANSLATE_QUERY_SYSTEM = """
+Translate the user's text into English.
 
 Rules:
 - Preserve spiritual and philosophical meaning
@@ -63,22 +72,20 @@ Rules:
 - Do NOT simplify
 - Do NOT add explanations
 
+Output ONLY the translated English text.
+"""
+
+TRANSLATE_QUERY_USER = """
 Text:
 {user_query}
-
-Output ONLY the translated English text.
 """
 
-REWRITE_QUERY = """
+REWRITE_QUERY_SYSTEM = """
 You are a query rewriting assistant.
 
 Your job is to rewrite the query into a clear, explicit search query
 for retrieving Vachanamrut scripture passages.
 
-Context:
-- Routing Metadata: {routing_metadata}
-- Original Question (English): {translated_query}
-
 Rules:
 - Resolve vague phrases like "this", "it", "that teaching"
 - Include chapter/section if known
@@ -88,32 +95,53 @@ Rules:
 Output ONLY the rewritten query text.
 """
 
-RERANK_PASSAGES = """
-You are a relevance ranking assistant.
-
-User Query:
-{rewritten_query}
+REWRITE_QUERY_USER = """
+Context:
+- Routing Metadata: {routing_metadata}
+- Original Question (English): {translated_query}
+"""
 
-Retrieved Passages:
-{numbered}
+RERANK_PASSAGES_SYSTEM = """
+You are a relevance ranking assistant.
 
 Task:
-Rank the passages by how well they answer the user's question.
+Rank the retrieved passages by how well they answer the user's question.
 
 Rules:
 - Rank by relevance, not similarity
 - Prefer direct explanations over general mentions
 
 Output JSON ONLY:
-{{
+{
 "ranked_indices": [0, 2, 1]
-}}
+}
+"""
+
+RERANK_PASSAGES_USER = """
+User Query:
+{rewritten_query}
+
+Retrieved Passages:
+{numbered}
 """
 
-FINAL_ANSWER = """
+FINAL_ANSWER_SYSTEM = """
 You are a spiritual scripture teacher.
 Answer the user's question using ONLY the provided context.
 
+Rules:
+- Be accurate and grounded in scripture
+- Do not invent teachings
+- If the context does not fully answer the question, say so honestly
+- Use respectful, calm, and clear language
+- Answer in the requested Answer Language
+- Match cultural tone:
+• Gujarati → formal spiritual Gujarati
+• Hindi → simple, devotional Hindi
+• English → clear explanatory English
+"""
+
+FINAL_ANSWER_USER = """
 Context:
 {context_text}
 
@@ -122,15 +150,59 @@ Question (English):
 
 Answer Language: {language}
 
+Now provide the answer.
+"""
+
+SUMMARIZE_DISCOURSE_SYSTEM = """
+You are a spiritual scripture teacher preparing study notes.
+Summarize the given Vachanamrut discourse using ONLY its text.
+
 Rules:
-- Be accurate and grounded in scripture
+- Be accurate and grounded in the discourse
 - Do not invent teachings
-- If the context does not fully answer the question, say so honestly
-- Use respectful, calm, and clear language
-- Match cultural tone:
+- Summary: one short paragraph (3-5 sentences)
+- Key teachings: 3-6 concise bullet points
+- Write in the requested Output Language, with the same cultural tone as answers:
 • Gujarati → formal spiritual Gujarati
 • Hindi → simple, devotional Hindi
 • English → clear explanatory English
 
-Now provide the answer.
+Output JSON ONLY:
+{
+"summary": "...",
+"key_teachings": ["...", "..."]
+}
 """
+
+SUMMARIZE_DISCOURSE_USER = """
+Discourse: Vachanamrut {reference}
+
+Output Language: {language}
+
+Text:
+{text}
+"""
+
+TEMPLATES = {
+    "detect_language": (DETECT_LANGUAGE_SYSTEM, DETECT_LANGUAGE_USER),
+    "route_query": (ROUTE_QUERY_SYSTEM, ROUTE_QUERY_USER),
+    "translate_query": (TRANSLATE_QUERY_SYSTEM, TRANSLATE_QUERY_USER),
+    "rewrite_query": (REWRITE_QUERY_SYSTEM, REWRITE_QUERY_USER),
+    "rerank_passages": (RERANK_PASSAGES_SYSTEM, RERANK_PASSAGES_USER),
+    "final_answer": (FINAL_ANSWER_SYSTEM, FINAL_ANSWER_USER),
+    "summarize_discourse": (SUMMARIZE_DISCOURSE_SYSTEM, SUMMARIZE_DISCOURSE_USER),
+}
+
+
+def build_messages(template: str, **kwargs):
+    """Returns [system (static prefix), user (dynamic suffix)] chat messages for a template."""
+    system, user = TEMPLATES[template]
+    return [
+        {"role": "system", "content": system.strip()},
+        {"role": "user", "content": user.format(**kwargs).strip()}
+    ]
+
+
+def estimate_tokens(text: str):
+    # ~4 chars per token for English; good enough for accounting, providers report exact usage
+    return max(1, len(text) // 4)
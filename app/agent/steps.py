@@ -1,55 +1,106 @@
 import json
-from app.services.llm_service import llm_service
+import re
+from app.services.graph import service_graph
 from app.agent import prompts
 
-async def detect_language(user_query: str):
-    prompt = prompts.DETECT_LANGUAGE.format(user_query=user_query)
-    response = await llm_service.generate_response(
-        messages=[{"role": "user", "content": prompt}],
-        json_mode=True
+async def detect_language(user_query: str, llm=None):
+    llm = llm or service_graph.llm
+    response = await llm.generate_response(
+        messages=prompts.build_messages("detect_language", user_query=user_query),
+        json_mode=True,
+        template="detect_language"
     )
     content = json.loads(response.choices[0].message.content)
     return content.get("language", "en")
 
-async def route_query(user_query: str, history_context: str):
-    prompt = prompts.ROUTE_QUERY.format(
-        user_query=user_query, 
-        history_context=history_context
-    )
-    response = await llm_service.generate_response(
-        messages=[{"role": "user", "content": prompt}],
-        json_mode=True
+async def route_query(user_query: str, history_context: str, llm=None):
+    llm = llm or service_graph.llm
+    response = await llm.generate_response(
+        messages=prompts.build_messages(
+            "route_query",
+            user_query=user_query, 
+            history_context=history_context
+        ),
+        json_mode=True,
+        template="route_query"
     )
     return json.loads(response.choices[0].message.content)
 
-async def translate_query(user_query: str):
-    prompt = prompts.TRANSLATE_QUERY.format(user_query=user_query)
-    response = await llm_service.generate_response(
-        messages=[{"role": "user", "content": prompt}],
-        json_mode=False
-    )
-    return response.choices[0].message.content
+async def translate_query(user_query: str, llm=None, translator=None):
+    llm = llm or service_graph.llm
+    translator = translator or service_graph.translator
 
-async def rewrite_query(translated_query: str, routing_metadata: dict):
-    prompt = prompts.REWRITE_QUERY.format(
-        translated_query=translated_query,
-        routing_metadata=routing_metadata
-    )
-    response = await llm_service.generate_response(
-        messages=[{"role": "user", "content": prompt}],
-        json_mode=False
+    async def with_llm(text: str):
+        response = await llm.generate_response(
+            messages=prompts.build_messages("translate_query", user_query=text),
+            json_mode=False,
+            template="translate_query"
+        )
+        return response.choices[0].message.content
+
+    # Glossary / cached queries never reach the LLM
+    return await translator.translate(user_query, with_llm)
+
+async def rewrite_query(translated_query: str, routing_metadata: dict, llm=None):
+    llm = llm or service_graph.llm
+    response = await llm.generate_response(
+        messages=prompts.build_messages(
+            "rewrite_query",
+            translated_query=translated_query,
+            routing_metadata=routing_metadata
+        ),
+        json_mode=False,
+        template="rewrite_query"
     )
     return response.choices[0].message.content
 
-async def rerank_passages(rewritten_query: str, documents: list):
+async def rerank_passages(rewritten_query: str, documents: list, llm=None):
+    llm = llm or service_graph.llm
     numbered = "\n".join([f"[{i}] {doc}" for i, doc in enumerate(documents)])
-    prompt = prompts.RERANK_PASSAGES.format(
-        rewritten_query=rewritten_query,
-        numbered=numbered
-    )
-    response = await llm_service.generate_response(
-        messages=[{"role": "user", "content": prompt}],
-        json_mode=True
+    response = await llm.generate_response(
+        messages=prompts.build_messages(
+            "rerank_passages",
+            rewritten_query=rewritten_query,
+            numbered=numbered
+        ),
+        json_mode=True,
+        template="rerank_passages"
     )
     content = json.loads(response.choices[0].message.content)
     return content.get("ranked_indices", [])
+
+# Words that point back at the previous answer (en / hi / gu)
+# A follow-up needs a continuation cue and may only contain cues, anaphors and filler words.
+# Anything else (a topic, a chapter name, a number) makes it a new question.
+FOLLOW_UP_CUES = {
+    "further", "elaborate", "more", "continue", "expand", "deeper", "detail", "details", "again",
+    "विस्तार", "अधिक", "आगे", "फिर", "दोबारा",
+    "વધુ", "વિસ્તારથી", "વિસ્તાર", "આગળ", "ફરીથી",
+}
+FOLLOW_UP_FILLER = {
+    "this", "that", "it", "please", "explain", "tell", "me", "about", "on", "in", "a", "bit", "little",
+    "can", "could", "you", "go", "the", "point", "answer", "some",
+    "इस", "इसे", "यह", "इसको", "इसके", "को", "से", "के", "बारे", "में", "मुझे", "और", "थोड़ा", "कृपया",
+    "समझाइए", "समझाओ", "बताइए", "बताओ",
+    "આ", "એ", "એના", "તેના", "એને", "તેને", "આને", "મને", "થોડું", "વિશે", "સમજાવો", "કહો", "જણાવો",
+}
+
+def is_follow_up(user_query: str):
+    """Cheap local check (no LLM): a pure continuation of the previous turn ("explain this further", "વધુ સમજાવો")."""
+    words = re.findall(r"[^\s?!.,।;:]+", user_query.lower())
+    return (0 < len(words) <= 12
+            and any(w in FOLLOW_UP_CUES for w in words)
+            and all(w in FOLLOW_UP_CUES or w in FOLLOW_UP_FILLER for w in words))
+
+# Summary-style intent: single words match whole tokens, phrases match anywhere
+SUMMARY_WORDS = {"summary", "summarize", "summarise", "gist", "overview", "સાર", "સારાંશ", "सार", "सारांश"}
+SUMMARY_PHRASES = (
+    "main teaching", "key teaching", "main point", "key point", "main message",
+    "મુખ્ય ઉપદેશ", "મુખ્ય શીખ", "મુખ્ય વાત", "मुख्य शिक्षा", "मुख्य उपदेश", "मुख्य बात",
+)
+
+def is_summary_request(user_query: str):
+    """Cheap local check (no LLM): does the user want a discourse summary / main teachings?"""
+    text = user_query.lower()
+    words = re.findall(r"[^\s?!.,।;:]+", text)
+    return any(w in SUMMARY_WORDS for w in words) or any(p in text for p in SUMMARY_PHRASES)
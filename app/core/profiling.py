@@ -0,0 +1,246 @@
+"""
+Request profiling for /ask and /vachanamrut.
+
+Every request on a profiled path gets a cheap stage breakdown (parse/validate,
+language, routing, embedding, ANN, rerank, answer, SSE encoding...). Profiling
+is switched on globally with PROFILE_REQUESTS, or per request with the
+`X-Profile` header when it comes with `X-Profile-Token: <PROFILE_TOKEN>`
+(without a configured token the header is ignored), using one of two modes:
+
+- "cpu": samples all thread stacks with a background sampler (a few % overhead)
+  and writes collapsed stacks (`<id>.folded`, input for flamegraph.pl / speedscope).
+- "1" / "all": also diffs tracemalloc snapshots and writes the top allocation
+  sites (`<id>.alloc.txt`). tracemalloc slows allocation-heavy code many times
+  over, so use it to find hotspots, not to measure latency.
+
+At most PROFILE_MAX_FILES files are kept in PROFILE_DIR (oldest deleted first).
+
+Note: requests share the event loop, so samples taken while several profiled
+requests overlap are attributed to each of them.
+"""
+import asyncio
+import contextvars
+import hmac
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+from app.core.settings import settings
+
+current_profile = contextvars.ContextVar("current_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self, path: str, mode: str = ""):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.path = path
+        self.sampled = mode in ("cpu", "1", "all", "true")
+        self.trace_alloc = self.sampled and mode != "cpu"
+        self.started = time.perf_counter()
+        self.duration = None
+        self.status = None
+        self.stages = {}
+        self.samples = Counter()
+        self.snapshot = None
+        self.files = []
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "path": self.path,
+            "status": self.status,
+            "duration_ms": round((self.duration or 0) * 1000, 1),
+            "profiled": ("all" if self.trace_alloc else "cpu") if self.sampled else None,
+            "stages_ms": {name: round(s * 1000, 1) for name, s in sorted(self.stages.items(), key=lambda kv: -kv[1])},
+            "files": self.files
+        }
+
+
+@contextmanager
+def stage(name: str):
+    """Times a block into the current request's stage breakdown (no-op outside a request)."""
+    profile = current_profile.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - started)
+
+
+def add(name: str, seconds: float):
+    profile = current_profile.get()
+    if profile is not None:
+        profile.add(name, seconds)
+
+
+def since_start(name: str):
+    """Records the time from request arrival until now as a stage (e.g. body parsing + validation)."""
+    profile = current_profile.get()
+    if profile is not None:
+        profile.add(name, time.perf_counter() - profile.started)
+
+
+class Profiler:
+    """Shared stack sampler + tracemalloc lifecycle, running only while profiled requests are active."""
+
+    def __init__(self, interval: float, keep: int):
+        self.interval = interval
+        self.active = set()
+        self.recent = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._started_tracemalloc = False
+        self._tracing = 0
+
+    def start(self, profile: RequestProfile):
+        with self._lock:
+            self.active.add(profile)
+            if profile.trace_alloc:
+                self._tracing += 1
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(settings.PROFILE_TRACEMALLOC_FRAMES)
+                    self._started_tracemalloc = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+                self._thread.start()
+        if profile.trace_alloc:
+            profile.snapshot = tracemalloc.take_snapshot()
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {}
+        while True:
+            with self._lock:
+                if not self.active:
+                    self._thread = None
+                    return
+                profiles = list(self.active)
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, "thread"))
+                collapsed = ";".join(reversed(stack))
+                for profile in profiles:
+                    profile.samples[collapsed] += 1
+            time.sleep(self.interval)
+
+    def finish(self, profile: RequestProfile):
+        profile.duration = time.perf_counter() - profile.started
+        if profile.sampled:
+            snapshot = tracemalloc.take_snapshot() if profile.trace_alloc and tracemalloc.is_tracing() else None
+            with self._lock:
+                self.active.discard(profile)
+                if profile.trace_alloc:
+                    self._tracing -= 1
+                    if not self._tracing and self._started_tracemalloc:
+                        tracemalloc.stop()
+                        self._started_tracemalloc = False
+            self._write(profile, snapshot)
+        self.recent.append(profile)
+
+    def _write(self, profile: RequestProfile, snapshot):
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        base = os.path.join(settings.PROFILE_DIR, profile.id)
+
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            for stack, count in profile.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        profile.files.append(base + ".folded")
+
+        if snapshot is not None and profile.snapshot is not None:
+            with open(base + ".alloc.txt", "w", encoding="utf-8") as f:
+                for diff in snapshot.compare_to(profile.snapshot, "lineno")[:25]:
+                    f.write(f"{diff}\n")
+            profile.files.append(base + ".alloc.txt")
+        profile.snapshot = None
+        profile.samples.clear()
+        self._rotate()
+
+    def _rotate(self):
+        paths = [os.path.join(settings.PROFILE_DIR, name) for name in os.listdir(settings.PROFILE_DIR)
+                 if name.endswith((".folded", ".alloc.txt"))]
+        if len(paths) <= settings.PROFILE_MAX_FILES:
+            return
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:len(paths) - settings.PROFILE_MAX_FILES]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def slowest(self, limit: int):
+        return [p.summary() for p in sorted(self.recent, key=lambda p: -(p.duration or 0))[:limit]]
+
+
+profiler = Profiler(interval=settings.PROFILE_SAMPLE_INTERVAL, keep=settings.PROFILE_KEEP_RECENT)
+
+
+def authorized(headers: dict):
+    """True when X-Profile-Token matches PROFILE_TOKEN (headers as raw ASGI bytes)."""
+    if not settings.PROFILE_TOKEN:
+        return False
+    return hmac.compare_digest(headers.get(b"x-profile-token", b""), settings.PROFILE_TOKEN.encode("utf-8"))
+
+
+def requested_mode(headers: dict):
+    """Profiling mode from X-Profile, honoured only with the right X-Profile-Token."""
+    mode = headers.get(b"x-profile", b"").decode("latin-1").lower()
+    return mode if mode and authorized(headers) else ""
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware, so it sees the whole streamed body (not just the headers)."""
+
+    def __init__(self, app, paths=("/ask", "/vachanamrut")):
+        self.app = app
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["path"], mode=requested_mode(dict(scope["headers"])) or settings.PROFILE_REQUESTS)
+        token = current_profile.set(profile)
+        if profile.sampled:
+            profiler.start(profile)
+
+        first_byte = False
+
+        async def send_wrapper(message):
+            nonlocal first_byte
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                if profile.sampled:
+                    message = dict(message, headers=list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())])
+            elif message["type"] == "http.response.body" and not first_byte:
+                first_byte = True
+                profile.add("time_to_first_byte", time.perf_counter() - profile.started)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+            if profile.sampled:
+                # Snapshot diffing and file writes are slow: keep them off the event loop
+                await asyncio.to_thread(profiler.finish, profile)
+            else:
+                profiler.finish(profile)
@@ -18,9 +18,85 @@ class Settings:
     # Paths
     VECTOR_DB_PATH: str = "./data/vachanamrut_db"
     JSON_DATA_PATH: str = "./data/vachanamrut_cleaned.json"
+    COLLECTION_NAME: str = "vachanamrut_rag"
+    SUMMARY_STORE_PATH: str = "./data/vachanamrut_summaries.json"
+    INGEST_MANIFEST_PATH: str = "./data/vachanamrut_db/ingest_manifest.json"
+
+    # Ingestion (Chunking)
+    CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", "1000"))
+    CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "200"))
     
     # Model Config
     LLM_MODEL: str = "llama-3.3-70b-versatile"
+    # Context caching needs a pinned version (e.g. "gemini-1.5-flash-001"); it is
+    # skipped for unversioned aliases. Calls and caches always use this same id.
+    GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+    # Provider endpoints (None = official APIs; the chaos harness points these at local stand-ins)
+    GROQ_BASE_URL: str = os.getenv("GROQ_BASE_URL") or None
+    GEMINI_API_ENDPOINT: str = os.getenv("GEMINI_API_ENDPOINT") or None
+    LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", "30"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "2")) # Groq SDK retries (429/5xx) per provider
     EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
+    # "torch" (sentence-transformers) or "onnx" (ONNX Runtime, no torch import)
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "torch")
+    ONNX_MODEL_DIR: str = os.getenv("ONNX_MODEL_DIR", "./data/onnx/all-MiniLM-L6-v2")
+    ONNX_QUANTIZED: bool = os.getenv("ONNX_QUANTIZED", "1") == "1"
+    EMBEDDING_THREADS: int = int(os.getenv("EMBEDDING_THREADS", "1"))
+
+    # Retrieval Planning
+    SEARCH_DEFAULT_K: int = 5
+    SEARCH_MIN_K: int = int(os.getenv("SEARCH_MIN_K", "3"))
+    SEARCH_MAX_K: int = int(os.getenv("SEARCH_MAX_K", "8"))
+    SEARCH_SCORE_MARGIN: float = float(os.getenv("SEARCH_SCORE_MARGIN", "0.5"))
+    DIRECT_FETCH_MAX_CHUNKS: int = int(os.getenv("DIRECT_FETCH_MAX_CHUNKS", "12"))
+
+    # Gemini context caching for static system prefixes (the API rejects small prefixes)
+    GEMINI_CONTEXT_CACHE: bool = os.getenv("GEMINI_CONTEXT_CACHE", "1") == "1"
+    GEMINI_CACHE_MIN_TOKENS: int = int(os.getenv("GEMINI_CACHE_MIN_TOKENS", "32768"))
+    GEMINI_CACHE_TTL: int = int(os.getenv("GEMINI_CACHE_TTL", "3600"))
+    GEMINI_CACHE_RETRY_AFTER: int = int(os.getenv("GEMINI_CACHE_RETRY_AFTER", "300")) # after a failed cache create
+
+    # Conversation Sessions - "memory" (per worker) or "sqlite" (shared by workers)
+    SESSION_BACKEND: str = os.getenv("SESSION_BACKEND", "memory")
+    SESSION_DB_PATH: str = os.getenv("SESSION_DB_PATH", "./data/sessions.sqlite3")
+    SESSION_MAX_ENTRIES: int = int(os.getenv("SESSION_MAX_ENTRIES", "5000"))
+    SESSION_TTL: float = float(os.getenv("SESSION_TTL", "3600"))
+    SESSION_MAX_MESSAGES: int = 8
+
+    # Admission Control - global capacity is derived from the number of Groq keys
+    GROQ_RPM_PER_KEY: int = int(os.getenv("GROQ_RPM_PER_KEY", "30"))
+    LLM_CALLS_PER_REQUEST: int = 5
+    CONCURRENCY_PER_KEY: int = int(os.getenv("CONCURRENCY_PER_KEY", "4"))
+    ADMISSION_QUEUE_SIZE: int = int(os.getenv("ADMISSION_QUEUE_SIZE", "0")) # 0 = 4x concurrency
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "15"))
+    CLIENT_REQUESTS_PER_MIN: float = float(os.getenv("CLIENT_REQUESTS_PER_MIN", "10"))
+    CLIENT_BURST: int = int(os.getenv("CLIENT_BURST", "5"))
+    # Proxy addresses whose X-Forwarded-For header is trusted for per-client limits (comma separated)
+    TRUSTED_PROXIES: List[str] = [p.strip() for p in os.getenv("TRUSTED_PROXIES", "").split(",") if p.strip()]
+
+    # Final Answer Cache (single-flight, per worker)
+    ANSWER_CACHE_MAX_ENTRIES: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+    ANSWER_CACHE_TTL: float = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+
+    # Query translation - glossary terms are translated locally, LLM translations are cached on disk
+    TRANSLATION_CACHE_PATH: str = os.getenv("TRANSLATION_CACHE_PATH", "./data/translations.sqlite3")
+    TRANSLATION_LOCAL_MAX_TERMS: int = int(os.getenv("TRANSLATION_LOCAL_MAX_TERMS", "3"))
+
+    # Profiling - "cpu" (stack sampling) or "all" (+ tracemalloc); per request via
+    # the "X-Profile" header (needs PROFILE_TOKEN), or for every request via PROFILE_REQUESTS ("" = off)
+    PROFILE_REQUESTS: str = os.getenv("PROFILE_REQUESTS", "")
+    # The X-Profile header is ignored unless the request also sends X-Profile-Token with this secret
+    PROFILE_TOKEN: str = os.getenv("PROFILE_TOKEN", "")
+    PROFILE_MAX_FILES: int = int(os.getenv("PROFILE_MAX_FILES", "200")) # oldest files in PROFILE_DIR are deleted
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "./profiles")
+    PROFILE_SAMPLE_INTERVAL: float = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+    PROFILE_TRACEMALLOC_FRAMES: int = 1
+    PROFILE_KEEP_RECENT: int = 200
+
+    # Streaming (SSE) - tokens are coalesced into frames by time or size
+    SSE_FLUSH_INTERVAL: float = float(os.getenv("SSE_FLUSH_INTERVAL", "0.05"))
+    SSE_MAX_FRAME_CHARS: int = int(os.getenv("SSE_MAX_FRAME_CHARS", "256"))
+    SSE_HEARTBEAT_INTERVAL: float = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+    LLM_STREAM_BUFFER: int = int(os.getenv("LLM_STREAM_BUFFER", "32")) # provider chunks read ahead of the client
 
 settings = Settings()
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import time
+import traceback
+from typing import AsyncIterator, Awaitable, Callable
+
+from app.core import profiling
+from app.core.settings import settings
+
+# orjson is optional - it is several times faster than the stdlib encoder
+try:
+    import orjson
+
+    def encode(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def encode(obj) -> bytes:
+        return _encoder.encode(obj).encode("utf-8")
+
+DONE_FRAME = b"data: [DONE]\n\n"
+HEARTBEAT_FRAME = b": ping\n\n"
+
+
+def frame(chunk: dict) -> bytes:
+    # Format: "data: {JSON}\n\n"
+    started = time.perf_counter()
+    data = b"data: " + encode(chunk) + b"\n\n"
+    profiling.add("sse_encode", time.perf_counter() - started)
+    return data
+
+
+async def event_stream(
+    source: AsyncIterator[dict],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    flush_interval: float = settings.SSE_FLUSH_INTERVAL,
+    max_frame_chars: int = settings.SSE_MAX_FRAME_CHARS,
+    heartbeat_interval: float = settings.SSE_HEARTBEAT_INTERVAL,
+) -> AsyncIterator[bytes]:
+    """
+    Turns orchestrator chunks into SSE frames.
+
+    - Consecutive "token" chunks are merged into one frame, flushed once
+      `flush_interval` seconds have passed since the first buffered token
+      (checked as tokens arrive) or once `max_frame_chars` are buffered.
+    - Any other chunk type flushes pending tokens and is sent immediately.
+    - While the answer streams, the source is iterated directly: no task,
+      queue or timer per token. Between pipeline steps (before the first
+      token, after other chunks) the next chunk is awaited with a timeout, so a
+      comment frame goes out after `heartbeat_interval` seconds of silence.
+    - The client is checked for disconnect only when a frame is sent; a gone
+      client stops the stream and closes the source (and the LLM stream).
+    """
+    loop = asyncio.get_running_loop()
+    step = None  # in-flight source.__anext__() while waiting with a heartbeat timeout
+    streaming = False
+    failed = False
+
+    pending = []
+    pending_chars = 0
+    flush_at = None
+    last_sent = loop.time()
+
+    def take_tokens() -> bytes:
+        nonlocal pending, pending_chars, flush_at
+        data = frame({"type": "token", "data": "".join(pending)})
+        pending, pending_chars, flush_at = [], 0, None
+        return data
+
+    try:
+        while True:
+            try:
+                if streaming:
+                    item = await source.__anext__()
+                else:
+                    if step is None:
+                        step = asyncio.ensure_future(source.__anext__())
+                    done, _ = await asyncio.wait((step,), timeout=max(last_sent + heartbeat_interval - loop.time(), 0))
+                    if not done:
+                        if await is_disconnected():
+                            print("🔌 SSE: Client disconnected, cancelling pipeline.")
+                            return
+                        yield HEARTBEAT_FRAME
+                        last_sent = loop.time()
+                        continue
+                    item, step = step.result(), None
+            except StopAsyncIteration:
+                break
+            except Exception as e:
+                traceback.print_exc()
+                item, step, failed = {"error": str(e)}, None, True
+
+            streaming = item.get("type") == "token"
+            if streaming:
+                pending.append(item["data"])
+                pending_chars += len(item["data"])
+                now = loop.time()
+                if flush_at is None:
+                    flush_at = now + flush_interval
+                if pending_chars < max_frame_chars and now < flush_at:
+                    continue
+                out = take_tokens()
+            else:
+                out = (take_tokens() + frame(item)) if pending else frame(item)
+
+            if await is_disconnected():
+                print("🔌 SSE: Client disconnected, cancelling pipeline.")
+                return
+            yield out
+            last_sent = loop.time()
+            if failed:
+                break
+
+        if pending:
+            yield take_tokens()
+        yield DONE_FRAME
+    finally:
+        if step is not None and not step.done():
+            step.cancel()
+            try:
+                await step
+            except (asyncio.CancelledError, Exception):
+                pass
+        # Closing the generator runs the orchestrator's cleanup (LLM stream close)
+        try:
+            await source.aclose()
+        except Exception:
+            pass
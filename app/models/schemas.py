@@ -10,6 +10,8 @@ class ChatMessage(BaseModel):
 class QueryRequest(BaseModel):
     question: str
     history: List[ChatMessage] = [] # New Field!
+    # Server-side session: when set, history is kept by the server and can be omitted
+    conversation_id: Optional[str] = None
     
     # Manual overrides (Sidebar)
     chapter: Optional[str] = "All"
@@ -0,0 +1,165 @@
+"""
+Builds and validates the ONNX embedding backend (EMBEDDING_BACKEND=onnx).
+
+Usage:
+    python -m app.pipelines.export_onnx export          # model.onnx + model_int8.onnx + tokenizer.json
+    python -m app.pipelines.export_onnx parity          # cosine similarity vs the PyTorch embeddings
+    python -m app.pipelines.export_onnx bench           # latency / throughput / RSS for both backends
+
+Export and parity need torch + sentence-transformers (offline only);
+the server itself never imports torch when the ONNX backend is selected.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from app.core.settings import settings
+
+SAMPLE_TEXTS = [
+    "What is maya according to the Vachanamrut?",
+    "How does one attain ultimate liberation?",
+    "Explain the nature of the jiva, ishwar and Parabrahman.",
+    "What are the qualities of an ekantik bhakta?",
+    "Why is association with the Satpurush important?",
+    "માયા એટલે શું?",
+    "भक्ति का महत्व क्या है?",
+]
+
+
+def load_texts(limit: int):
+    """Real corpus passages when available, so parity covers scripture-length inputs."""
+    texts = list(SAMPLE_TEXTS)
+    if os.path.exists(settings.JSON_DATA_PATH):
+        with open(settings.JSON_DATA_PATH, "r", encoding="utf-8") as f:
+            for item in json.load(f):
+                text = item.get("text")
+                if text:
+                    texts.append(text[:2000])
+                if len(texts) >= limit:
+                    break
+    return texts[:limit]
+
+
+def export(output_dir: str, opset: int = 17):
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(output_dir, exist_ok=True)
+    name = f"sentence-transformers/{settings.EMBEDDING_MODEL}"
+    tokenizer = AutoTokenizer.from_pretrained(name)
+    model = AutoModel.from_pretrained(name).eval()
+    tokenizer.save_pretrained(output_dir) # writes tokenizer.json (fast tokenizer)
+
+    dummy = tokenizer(["export"], return_tensors="pt")
+    fp32_path = os.path.join(output_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy["input_ids"], dummy["attention_mask"], dummy["token_type_ids"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "token_type_ids": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+            },
+            opset_version=opset
+        )
+    print(f"📦 Exported {fp32_path}")
+
+    int8_path = os.path.join(output_dir, "model_int8.onnx")
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    print(f"📦 Quantized {int8_path}")
+
+
+def parity(threshold: float, limit: int):
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+    from app.services.embeddings import OnnxEmbeddingFunction
+
+    texts = load_texts(limit)
+    reference = SentenceTransformer(settings.EMBEDDING_MODEL).encode(texts, normalize_embeddings=True)
+
+    ok = True
+    for quantized in (False, True):
+        ef = OnnxEmbeddingFunction(settings.ONNX_MODEL_DIR, quantized=quantized, threads=settings.EMBEDDING_THREADS)
+        candidate = np.array(ef(texts))
+        cosine = (reference * candidate).sum(axis=1)
+        label = "int8" if quantized else "fp32"
+        print(f"📐 {label}: cosine min={cosine.min():.4f} mean={cosine.mean():.4f} over {len(texts)} texts")
+        ok = ok and cosine.min() >= threshold
+    if not ok:
+        print(f"❌ Parity below {threshold}")
+        sys.exit(1)
+    print("✅ Parity OK")
+
+
+def bench_backend(backend: str, limit: int, rounds: int):
+    """Runs in a fresh process so RSS reflects only this backend."""
+    import resource
+    from app.services.embeddings import get_embedding_function
+
+    texts = load_texts(limit)
+    started = time.perf_counter()
+    ef = get_embedding_function(backend)
+    load_s = time.perf_counter() - started
+    ef(texts[:1]) # warm-up
+
+    latencies = []
+    for i in range(rounds):
+        t0 = time.perf_counter()
+        ef([texts[i % len(texts)]])
+        latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+
+    t0 = time.perf_counter()
+    ef(texts)
+    throughput = len(texts) / (time.perf_counter() - t0)
+
+    print(json.dumps({
+        "backend": backend,
+        "load_s": round(load_s, 2),
+        "query_p50_ms": round(latencies[len(latencies) // 2], 2),
+        "query_p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        "batch_texts_per_s": round(throughput, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "torch_imported": "torch" in sys.modules
+    }))
+
+
+def bench(limit: int, rounds: int):
+    for backend in ("torch", "onnx"):
+        subprocess.run([
+            sys.executable, "-m", "app.pipelines.export_onnx", "bench-one",
+            "--backend", backend, "--limit", str(limit), "--rounds", str(rounds)
+        ], check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX embedding backend tools.")
+    parser.add_argument("command", choices=["export", "parity", "bench", "bench-one"])
+    parser.add_argument("--output", default=settings.ONNX_MODEL_DIR, help="Export directory")
+    parser.add_argument("--threshold", type=float, default=0.99, help="Minimum cosine similarity for parity")
+    parser.add_argument("--limit", type=int, default=128, help="Number of texts for parity/bench")
+    parser.add_argument("--rounds", type=int, default=200, help="Single-query latency samples")
+    parser.add_argument("--backend", default="onnx", help="Backend for bench-one")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export(args.output)
+    elif args.command == "parity":
+        parity(args.threshold, args.limit)
+    elif args.command == "bench":
+        bench(args.limit, args.rounds)
+    else:
+        bench_backend(args.backend, args.limit, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
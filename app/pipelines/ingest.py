@@ -0,0 +1,223 @@
+"""
+Offline ingestion: builds the `vachanamrut_rag` collection from the Librarian JSON.
+
+Every chunk is content-hashed (text + metadata + embedding/chunking config) and the
+hashes are written to a manifest next to the vector DB. Re-runs only embed and upsert
+chunks whose hash changed, and delete chunks that no longer exist.
+
+Usage:
+    python -m app.pipelines.ingest                 # incremental
+    python -m app.pipelines.ingest --full          # re-embed everything
+    python -m app.pipelines.ingest --dry-run       # show what would change
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.core.settings import settings
+
+MANIFEST_VERSION = 1
+
+# --- Worker process state (one model load per process) ---
+_worker_ef = None
+
+
+def _init_worker(backend: str):
+    global _worker_ef
+    from app.services.embeddings import get_embedding_function
+    _worker_ef = get_embedding_function(backend)
+
+
+def _embed_batch(texts: list):
+    # Sub-batches keep peak memory flat for very large ingest batches
+    embeddings = []
+    for i in range(0, len(texts), 64):
+        embeddings.extend(_worker_ef(texts[i:i + 64]))
+    return embeddings
+
+
+# --- Chunking ---
+def load_corpus(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def chunk_corpus(items: list, text_field: str):
+    """Returns [(id, text, metadata)] using the same id scheme as the existing index."""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=settings.CHUNK_SIZE,
+        chunk_overlap=settings.CHUNK_OVERLAP
+    )
+    chunks = []
+    for item in items:
+        text = item.get(text_field)
+        if not text:
+            continue
+        chapter = item.get("chapter", "")
+        section = str(item.get("section") or "")
+        number = int(item.get("vachanamrut_no"))
+        for i, piece in enumerate(splitter.split_text(text)):
+            chunk_id = f"{chapter}_{section}_{number}_{i}"
+            metadata = {
+                "chapter": chapter,
+                "section": section,
+                "vachanamrut_no": number,
+                "chunk_index": i
+            }
+            chunks.append((chunk_id, piece, metadata))
+    return chunks
+
+
+def content_hash(text: str, metadata: dict):
+    payload = json.dumps({
+        "text": text,
+        "metadata": metadata,
+        "model": settings.EMBEDDING_MODEL,
+        # Vectors differ between backends (and int8 vs fp32 ONNX), so switching re-embeds
+        "backend": settings.EMBEDDING_BACKEND,
+        "quantized": settings.ONNX_QUANTIZED if settings.EMBEDDING_BACKEND == "onnx" else None,
+        "chunking": [settings.CHUNK_SIZE, settings.CHUNK_OVERLAP]
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# --- Manifest ---
+def load_manifest(path: str):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    return {"version": MANIFEST_VERSION, "chunks": {}}
+
+
+def save_manifest(path: str, manifest: dict):
+    manifest["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+# --- Pipeline ---
+def ingest(source: str, db_path: str, manifest_path: str, text_field: str = "text",
+           workers: int = 1, batch_size: int = 512, full: bool = False, dry_run: bool = False):
+    global _worker_ef
+    started = time.perf_counter()
+    import chromadb
+    from app.services.embeddings import get_embedding_function
+
+    # Same embedding function as VectorService, so the collection's stored
+    # embedding-function config matches when the API opens it. Vectors are
+    # still computed in _embed_batch (the workers) and upserted explicitly.
+    ef = get_embedding_function(settings.EMBEDDING_BACKEND)
+    client = chromadb.PersistentClient(path=db_path)
+    collection = client.get_or_create_collection(name=settings.COLLECTION_NAME, embedding_function=ef)
+
+    manifest = load_manifest(manifest_path)
+    known = manifest["chunks"]
+    # A manifest that doesn't match the collection (e.g. DB deleted) can't be trusted
+    if full or collection.count() != len(known):
+        if known and not full:
+            print("⚠️ Ingest: Manifest out of sync with collection, re-embedding everything.")
+        # Unknown hashes force a re-embed; ids absent from the corpus still get deleted
+        known = {chunk_id: None for chunk_id in collection.get(include=[])["ids"]}
+
+    chunks = chunk_corpus(load_corpus(source), text_field)
+    current = {}
+    changed = []
+    for chunk_id, text, metadata in chunks:
+        digest = content_hash(text, metadata)
+        current[chunk_id] = digest
+        if known.get(chunk_id) != digest:
+            changed.append((chunk_id, text, metadata, digest))
+    stale = [chunk_id for chunk_id in known if chunk_id not in current]
+
+    print(f"📚 Ingest: {len(chunks)} chunks, {len(changed)} new/changed, {len(stale)} stale.")
+    if dry_run:
+        return {"chunks": len(chunks), "changed": len(changed), "stale": len(stale)}
+
+    if stale:
+        collection.delete(ids=stale)
+        for chunk_id in stale:
+            known.pop(chunk_id, None)
+
+    manifest["chunks"] = known
+    manifest["embedding_model"] = settings.EMBEDDING_MODEL
+    manifest["embedding_backend"] = settings.EMBEDDING_BACKEND
+    manifest["onnx_quantized"] = settings.ONNX_QUANTIZED if settings.EMBEDDING_BACKEND == "onnx" else None
+    manifest["chunking"] = {"size": settings.CHUNK_SIZE, "overlap": settings.CHUNK_OVERLAP}
+
+    if changed:
+        batches = [changed[i:i + batch_size] for i in range(0, len(changed), batch_size)]
+        texts = [[c[1] for c in batch] for batch in batches]
+
+        workers = min(workers, len(batches))
+        if workers > 1:
+            # Spawned, not forked: the parent has already loaded the model
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(settings.EMBEDDING_BACKEND,)
+            )
+            embedded = executor.map(_embed_batch, texts)
+        else:
+            executor = None
+            _worker_ef = ef
+            embedded = map(_embed_batch, texts)
+
+        try:
+            for n, (batch, embeddings) in enumerate(zip(batches, embedded), start=1):
+                collection.upsert(
+                    ids=[c[0] for c in batch],
+                    documents=[c[1] for c in batch],
+                    metadatas=[c[2] for c in batch],
+                    embeddings=embeddings
+                )
+                # Persist progress per batch so an interrupted run resumes where it stopped
+                known.update({c[0]: c[3] for c in batch})
+                save_manifest(manifest_path, manifest)
+                print(f"   ↳ Upserted batch {n}/{len(batches)} ({len(batch)} chunks)")
+        finally:
+            if executor:
+                executor.shutdown()
+
+    save_manifest(manifest_path, manifest)
+    elapsed = time.perf_counter() - started
+    print(f"✅ Ingest: Done in {elapsed:.1f}s.")
+    return {"chunks": len(chunks), "changed": len(changed), "stale": len(stale)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update the Vachanamrut vector index.")
+    parser.add_argument("--source", default=settings.JSON_DATA_PATH, help="Librarian JSON file")
+    parser.add_argument("--db", default=settings.VECTOR_DB_PATH, help="ChromaDB directory")
+    parser.add_argument("--manifest", default=settings.INGEST_MANIFEST_PATH, help="Manifest file")
+    parser.add_argument("--text-field", default="text", help="JSON field holding the discourse text")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Embedding processes")
+    parser.add_argument("--batch-size", type=int, default=512, help="Chunks per embedding batch")
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and re-embed everything")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    args = parser.parse_args()
+
+    ingest(
+        source=args.source,
+        db_path=args.db,
+        manifest_path=args.manifest,
+        text_field=args.text_field,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        full=args.full,
+        dry_run=args.dry_run
+    )
+
+
+if __name__ == "__main__":
+    main()
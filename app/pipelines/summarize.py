@@ -0,0 +1,85 @@
+"""
+Offline batch job: generates a summary and key-teaching bullets for every
+discourse in en/hi/gu and stores them in the summary store.
+
+Entries are tied to a hash of the source record, so re-runs only regenerate
+discourses whose text changed (or languages still missing).
+
+Usage:
+    python -m app.pipelines.summarize
+    python -m app.pipelines.summarize --languages en gu --concurrency 2
+"""
+import argparse
+import asyncio
+import json
+
+from app.agent import prompts
+from app.services.graph import service_graph
+from app.services.summary_store import LANGUAGES
+
+LANGUAGE_NAMES = {"en": "English", "hi": "Hindi", "gu": "Gujarati"}
+
+
+async def summarize_one(item: dict, language: str, text_field: str):
+    response = await service_graph.llm.generate_response(
+        messages=prompts.build_messages(
+            "summarize_discourse",
+            reference=" ".join(str(p) for p in (item.get("chapter"), item.get("section"), item.get("vachanamrut_no")) if p),
+            language=LANGUAGE_NAMES[language],
+            text=item.get(text_field, "")
+        ),
+        json_mode=True,
+        template="summarize_discourse"
+    )
+    content = json.loads(response.choices[0].message.content)
+    return content["summary"], content.get("key_teachings", [])
+
+
+async def run(languages: list, text_field: str, concurrency: int, save_every: int):
+    store = service_graph.summaries
+    corpus = service_graph.corpus
+    jobs = [
+        (item, language)
+        for item in corpus.data if item.get(text_field)
+        for language in languages
+        if store.get(item, language) is None
+    ]
+    print(f"📜 Summarize: {len(jobs)} summaries to generate.")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+    failed = 0
+
+    async def worker(item, language):
+        nonlocal done, failed
+        async with semaphore:
+            try:
+                summary, key_teachings = await summarize_one(item, language, text_field)
+            except Exception as e:
+                failed += 1
+                print(f"⚠️ Summarize failed for {item.get('chapter')} {item.get('vachanamrut_no')} ({language}): {e}")
+                return
+            store.put(item, language, summary, key_teachings)
+            done += 1
+            if done % save_every == 0:
+                store.save()
+                print(f"   ↳ {done}/{len(jobs)} saved")
+
+    await asyncio.gather(*(worker(item, language) for item, language in jobs))
+    store.save()
+    print(f"✅ Summarize: {done} generated, {failed} failed.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute per-discourse summaries.")
+    parser.add_argument("--languages", nargs="+", default=list(LANGUAGES), choices=LANGUAGES)
+    parser.add_argument("--text-field", default="text", help="JSON field holding the discourse text")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel LLM calls")
+    parser.add_argument("--save-every", type=int, default=20, help="Persist after this many summaries")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.languages, args.text_field, args.concurrency, args.save_every))
+
+
+if __name__ == "__main__":
+    main()
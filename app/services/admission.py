@@ -0,0 +1,156 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import OrderedDict
+from app.core.settings import settings
+
+# Lower value = served first
+PRIORITY_SHORT = 0     # Follow-ups and single-discourse lookups (few or no LLM calls)
+PRIORITY_PIPELINE = 1  # Full route -> search -> rerank -> answer pipeline
+
+
+class Rejected(Exception):
+    """Request shed by admission control; maps to an HTTP error with Retry-After."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Returns (admitted, seconds until a token is available)."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0.0
+        return False, (1 - self.tokens) / self.rate
+
+
+class Ticket:
+    """An admitted request's slot. `release` is idempotent."""
+
+    def __init__(self, controller):
+        self._controller = controller
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release()
+
+
+class AdmissionController:
+    """
+    Admission control in front of the agent pipeline.
+
+    - Global token bucket and concurrency limit, sized from the number of Groq
+      keys so bursts don't exhaust every key and fall back to Gemini.
+    - Per-client token bucket.
+    - Bounded wait queue ordered by priority, then arrival.
+    - Everything beyond that is shed with a Retry-After hint.
+    """
+
+    def __init__(self, keys: int):
+        keys = max(1, keys)
+        request_rate = keys * settings.GROQ_RPM_PER_KEY / 60 / settings.LLM_CALLS_PER_REQUEST
+        self.max_concurrent = keys * settings.CONCURRENCY_PER_KEY
+        self.max_queue = settings.ADMISSION_QUEUE_SIZE or self.max_concurrent * 4
+        # Bursts up to what the slots plus the queue can absorb
+        self.global_bucket = TokenBucket(rate=request_rate, capacity=self.max_concurrent + self.max_queue)
+
+        self._clients = OrderedDict()
+        self._waiters = []
+        self._seq = itertools.count()
+        self.in_flight = 0
+        self.waiting = 0
+        self.stats = {"admitted": 0, "queued": 0, "shed": {}, "max_queue_depth": 0, "queue_wait_total": 0.0}
+        print(f"🚦 Admission: {self.max_concurrent} concurrent, queue {self.max_queue}, {request_rate:.2f} req/s ({keys} Groq keys).")
+
+    def _client_bucket(self, client_id: str):
+        bucket = self._clients.get(client_id)
+        if bucket is None:
+            bucket = TokenBucket(rate=settings.CLIENT_REQUESTS_PER_MIN / 60, capacity=settings.CLIENT_BURST)
+            self._clients[client_id] = bucket
+            while len(self._clients) > 10000:
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(client_id)
+        return bucket
+
+    def _shed(self, status_code: int, reason: str, retry_after: float):
+        self.stats["shed"][reason] = self.stats["shed"].get(reason, 0) + 1
+        raise Rejected(status_code, reason, retry_after)
+
+    async def acquire(self, client_id: str, priority: int = PRIORITY_PIPELINE):
+        ok, wait = self._client_bucket(client_id).take()
+        if not ok:
+            self._shed(429, "client_rate_limited", wait)
+
+        ok, wait = self.global_bucket.take()
+        if not ok:
+            self._shed(503, "global_rate_limited", wait)
+
+        if self.in_flight < self.max_concurrent and self.waiting == 0:
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return Ticket(self)
+
+        if self.waiting >= self.max_queue:
+            self._shed(503, "queue_full", self.waiting / self.global_bucket.rate)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self.waiting += 1
+        self.stats["queued"] += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.waiting)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(future, timeout=settings.ADMISSION_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.waiting -= 1
+            self._shed(503, "queue_timeout", settings.ADMISSION_QUEUE_TIMEOUT)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release() # The slot was already handed to us
+            else:
+                self.waiting -= 1
+            raise
+
+        self.stats["admitted"] += 1
+        self.stats["queue_wait_total"] += time.monotonic() - started
+        return Ticket(self)
+
+    def _release(self):
+        # Hand the slot straight to the best waiter, skipping ones that gave up
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.waiting -= 1
+                future.set_result(True)
+                return
+        self.in_flight -= 1
+
+    def report(self):
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            **self.stats
+        }
+
+
+admission_controller = AdmissionController(keys=len(settings.GROQ_API_KEYS))
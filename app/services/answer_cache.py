@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Callable
+from app.core.settings import settings
+
+
+class InFlightAnswer:
+    """A final answer that is still streaming; any number of requests can follow it."""
+
+    def __init__(self):
+        self.tokens = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.task = None
+        self.cond = asyncio.Condition()
+
+
+class AnswerCache:
+    """
+    Single-flight cache for final answers.
+
+    - Finished answers are replayed from an LRU (with TTL).
+    - While an answer is streaming, identical requests attach to it and get the
+      tokens produced so far followed by the live ones (fan-out).
+    - The LLM stream runs in its own task, so it survives any one client
+      leaving; it is cancelled only once every subscriber has gone.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._done = OrderedDict()
+        self._inflight = {}
+        self.stats = {"replayed": 0, "joined": 0, "generated": 0, "not_stored": 0}
+
+    @staticmethod
+    def key(passage_ids: list, query: str, language: str, model: str):
+        payload = json.dumps([passage_ids, query.strip(), language, model], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _get_done(self, key: str):
+        entry = self._done.get(key)
+        if entry is None:
+            return None
+        answer, stored_at = entry
+        if time.time() - stored_at > self.ttl:
+            del self._done[key]
+            return None
+        self._done.move_to_end(key)
+        return answer
+
+    def _store(self, key: str, answer: str):
+        self._done[key] = (answer, time.time())
+        self._done.move_to_end(key)
+        while len(self._done) > self.max_entries:
+            self._done.popitem(last=False)
+
+    async def stream(self, key: str, produce: Callable[[], AsyncIterator[str]], cacheable: Callable[[], bool] = None):
+        """
+        Yields answer tokens for `key`. `produce` is only called when neither a
+        finished nor an in-flight answer exists. Raises the producer's error.
+        `cacheable` is asked once the answer is complete whether it may be stored.
+        """
+        answer = self._get_done(key)
+        if answer is not None:
+            self.stats["replayed"] += 1
+            yield answer
+            return
+
+        entry = self._inflight.get(key)
+        if entry is None:
+            self.stats["generated"] += 1
+            entry = InFlightAnswer()
+            self._inflight[key] = entry
+            entry.task = asyncio.create_task(self._run(key, entry, produce, cacheable))
+        else:
+            self.stats["joined"] += 1
+
+        tokens = self._follow(key, entry)
+        try:
+            async for token in tokens:
+                yield token
+        finally:
+            await tokens.aclose()
+
+    async def _follow(self, key: str, entry: InFlightAnswer):
+        entry.subscribers += 1
+        position = 0
+        try:
+            while True:
+                async with entry.cond:
+                    while position >= len(entry.tokens) and not entry.done:
+                        await entry.cond.wait()
+                    new_tokens = entry.tokens[position:]
+                    position = len(entry.tokens)
+                    done, error = entry.done, entry.error
+                for token in new_tokens:
+                    yield token
+                if done:
+                    if error: raise error
+                    return
+        finally:
+            entry.subscribers -= 1
+            if entry.subscribers == 0 and not entry.done:
+                # Nobody is listening any more: stop paying for the LLM stream
+                if self._inflight.get(key) is entry:
+                    del self._inflight[key]
+                entry.task.cancel()
+
+    async def _run(self, key: str, entry: InFlightAnswer, produce, cacheable=None):
+        tokens = produce()
+        try:
+            async for token in tokens:
+                async with entry.cond:
+                    entry.tokens.append(token)
+                    entry.cond.notify_all()
+            if entry.tokens:
+                if cacheable is None or cacheable():
+                    self._store(key, "".join(entry.tokens))
+                else:
+                    self.stats["not_stored"] += 1
+        except asyncio.CancelledError:
+            entry.error = Exception("Answer stream cancelled.")
+        except Exception as e:
+            entry.error = e
+        finally:
+            await tokens.aclose()
+            if self._inflight.get(key) is entry:
+                del self._inflight[key]
+            async with entry.cond:
+                entry.done = True
+                entry.cond.notify_all()
+
+    def report(self):
+        return dict(self.stats, cached=len(self._done), inflight=len(self._inflight))
+
+
+answer_cache = AnswerCache(
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    ttl=settings.ANSWER_CACHE_TTL
+)
@@ -0,0 +1,76 @@
+import os
+from app.core.settings import settings
+
+try:
+    from chromadb.api.types import EmbeddingFunction
+except ImportError:
+    EmbeddingFunction = object
+
+
+class OnnxEmbeddingFunction(EmbeddingFunction):
+    """
+    Sentence embeddings from an ONNX Runtime export of the embedding model
+    (optionally int8 dynamic-quantized), tokenized with the Rust `tokenizers`
+    package. Mean pooling + L2 normalization, matching the sentence-transformers
+    pipeline for all-MiniLM-L6-v2. Never imports torch.
+
+    Build the model directory with `python -m app.pipelines.export_onnx export`.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = True, threads: int = 1, max_length: int = 256):
+        import numpy as np
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.np = np
+        model_file = "model_int8.onnx" if quantized else "model.onnx"
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model_file),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        print(f"⚡ Embeddings: ONNX Runtime ({model_file}, {threads} threads).")
+
+    def __call__(self, input):
+        np = self.np
+        encoded = self.tokenizer.encode_batch(list(input))
+        ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encoded], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+        weights = mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist()
+
+
+def get_embedding_function(backend: str = None):
+    """
+    Returns the Chroma-compatible embedding function for `settings.EMBEDDING_BACKEND`:
+    "torch" (sentence-transformers, full precision) or "onnx" (ONNX Runtime, CPU).
+    """
+    backend = backend or settings.EMBEDDING_BACKEND
+    if backend == "onnx":
+        return OnnxEmbeddingFunction(
+            model_dir=settings.ONNX_MODEL_DIR,
+            quantized=settings.ONNX_QUANTIZED,
+            threads=settings.EMBEDDING_THREADS
+        )
+
+    from chromadb.utils import embedding_functions
+    return embedding_functions.SentenceTransformerEmbeddingFunction(
+        model_name=settings.EMBEDDING_MODEL
+    )
@@ -0,0 +1,94 @@
+# Curated scripture vocabulary: Gujarati / Hindi term -> English form used in the
+# English Vachanamrut (and therefore in the vector index). Only words that are
+# unambiguous in everyday use belong here (not e.g. કામ "work/lust", અક્ષર "letter").
+
+TERMS = {
+    # Gujarati
+    "વચનામૃત": "Vachanamrut",
+    "માયા": "maya",
+    "મોક્ષ": "moksha (liberation)",
+    "ભક્તિ": "bhakti (devotion)",
+    "એકાંતિક": "ekantik",
+    "એકાંતિક ધર્મ": "ekantik dharma",
+    "ધર્મ": "dharma",
+    "જ્ઞાન": "gnan (spiritual knowledge)",
+    "વૈરાગ્ય": "vairagya (detachment)",
+    "આત્મા": "atma (soul)",
+    "જીવ": "jiva",
+    "ઈશ્વર": "ishwar",
+    "પુરુષોત્તમ": "Purushottam",
+    "બ્રહ્મ": "Brahman",
+    "પરબ્રહ્મ": "Parabrahman",
+    "અક્ષરધામ": "Akshardham",
+    "અક્ષરબ્રહ્મ": "Aksharbrahman",
+    "સત્સંગ": "satsang",
+    "સેવા": "seva (service)",
+    "ઉપાસના": "upasana (worship)",
+    "મૂર્તિ": "murti",
+    "સત્પુરુષ": "Satpurush",
+    "અંતઃકરણ": "antahkaran (inner faculties)",
+    "ઇન્દ્રિયો": "indriyas (senses)",
+    "કુસંગ": "kusang (bad company)",
+    "ભગવાન": "God",
+    "વાસના": "vasana (worldly desires)",
+    "સ્વધર્મ": "swadharma",
+    "મહિમા": "mahima (glory)",
+    "નિશ્ચય": "nishchay (conviction)",
+    "આજ્ઞા": "agna (commands)",
+    "મન": "mind",
+    "ક્રોધ": "anger",
+    "લોભ": "greed",
+    "અહંકાર": "ego",
+    # Hindi
+    "वचनामृत": "Vachanamrut",
+    "माया": "maya",
+    "मोक्ष": "moksha (liberation)",
+    "भक्ति": "bhakti (devotion)",
+    "एकांतिक": "ekantik",
+    "एकांतिक धर्म": "ekantik dharma",
+    "धर्म": "dharma",
+    "ज्ञान": "gnan (spiritual knowledge)",
+    "वैराग्य": "vairagya (detachment)",
+    "आत्मा": "atma (soul)",
+    "जीव": "jiva",
+    "ईश्वर": "ishwar",
+    "पुरुषोत्तम": "Purushottam",
+    "ब्रह्म": "Brahman",
+    "परब्रह्म": "Parabrahman",
+    "अक्षरधाम": "Akshardham",
+    "अक्षरब्रह्म": "Aksharbrahman",
+    "सत्संग": "satsang",
+    "सेवा": "seva (service)",
+    "उपासना": "upasana (worship)",
+    "मूर्ति": "murti",
+    "सत्पुरुष": "Satpurush",
+    "अंतःकरण": "antahkaran (inner faculties)",
+    "इन्द्रियाँ": "indriyas (senses)",
+    "कुसंग": "kusang (bad company)",
+    "भगवान": "God",
+    "वासना": "vasana (worldly desires)",
+    "स्वधर्म": "swadharma",
+    "महिमा": "mahima (glory)",
+    "निश्चय": "nishchay (conviction)",
+    "आज्ञा": "agna (commands)",
+    "मन": "mind",
+    "क्रोध": "anger",
+    "लोभ": "greed",
+    "अहंकार": "ego",
+}
+
+# "What is / what does ... mean" words: a query of these plus glossary terms
+# can be translated locally as "What is <terms>?"
+WHAT_WORDS = {"શું", "શુ", "એટલે", "અર્થ", "क्या", "मतलब", "अर्थ"}
+
+# Grammatical glue that carries no meaning for search
+FILLER_WORDS = {
+    "છે", "નો", "ની", "નું", "ના", "ને", "વિશે", "સમજાવો", "કહો",
+    "है", "हैं", "का", "की", "के", "को", "बारे", "में", "समझाइए", "बताइए",
+}
+
+# Several terms are only translated locally when joined by one of these
+CONJUNCTIONS = {"અને", "और", "तथा"}
+
+# Gujarati case endings attached to the noun ("માયાનું" -> "માયા")
+GUJARATI_SUFFIXES = ("નું", "ની", "નો", "ના", "ને", "માં", "થી")
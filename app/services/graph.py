@@ -0,0 +1,79 @@
+class ServiceGraph:
+    """
+    The single set of shared services (LLM, embeddings, vector index, corpus,
+    sessions, answer cache, summaries, translator) used by every pipeline variant.
+
+    Each service is created on first access and reused afterwards, so the
+    embedding model, the Chroma index and the corpus JSON are loaded once per
+    process. Pass instances to the constructor to inject alternatives.
+    """
+
+    def __init__(self, llm=None, vectors=None, corpus=None, sessions=None, answers=None, summaries=None, translator=None):
+        self._llm = llm
+        self._vectors = vectors
+        self._corpus = corpus
+        self._sessions = sessions
+        self._answers = answers
+        self._summaries = summaries
+        self._translator = translator
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            from app.services.llm_service import llm_service
+            self._llm = llm_service
+        return self._llm
+
+    @property
+    def vectors(self):
+        if self._vectors is None:
+            from app.services.vector_service import vector_service
+            self._vectors = vector_service
+        return self._vectors
+
+    @property
+    def embeddings(self):
+        # Owned by the vector service so the model is never loaded twice
+        return self.vectors.ef
+
+    @property
+    def corpus(self):
+        if self._corpus is None:
+            from app.services.librarian import librarian_service
+            self._corpus = librarian_service
+        return self._corpus
+
+    @property
+    def sessions(self):
+        if self._sessions is None:
+            from app.services.session_store import session_store
+            self._sessions = session_store
+        return self._sessions
+
+    @property
+    def answers(self):
+        if self._answers is None:
+            from app.services.answer_cache import answer_cache
+            self._answers = answer_cache
+        return self._answers
+
+    @property
+    def summaries(self):
+        if self._summaries is None:
+            from app.services.summary_store import summary_store
+            self._summaries = summary_store
+        return self._summaries
+
+    @property
+    def translator(self):
+        if self._translator is None:
+            from app.services.translation import translator
+            self._translator = translator
+        return self._translator
+
+    def warm_up(self):
+        """Loads every service now instead of on the first request."""
+        return self.llm, self.vectors, self.corpus, self.sessions, self.summaries, self.translator
+
+
+service_graph = ServiceGraph()
@@ -5,12 +5,18 @@ class Librarian:
     def __init__(self, json_path: str):
         self.json_path = json_path
         self.data = []
+        self.index = {}
         self.load_data()
 
     def load_data(self):
         if os.path.exists(self.json_path):
             with open(self.json_path, 'r', encoding='utf-8') as f:
                 self.data = json.load(f)
+            # (chapter, section, number) -> item, for O(1) lookups (first match wins, as before)
+            self.index = {}
+            for item in self.data:
+                key = (item.get("chapter"), str(item.get("section")), int(item.get("vachanamrut_no")))
+                self.index.setdefault(key, item)
             print(f"📚 Librarian: Loaded {len(self.data)} Vachanamruts.")
         else:
             print(f"❌ Librarian Error: File not found at {self.json_path}")
@@ -19,12 +25,7 @@ class Librarian:
         # Normalize section for comparison (handle "None" string from URL)
         search_section = "" if section == "None" else section
 
-        for item in self.data:
-            if (item.get("chapter") == chapter and 
-                str(item.get("section")) == str(search_section) and 
-                int(item.get("vachanamrut_no")) == number):
-                return item
-        return None
+        return self.index.get((chapter, str(search_section), int(number)))
 
 # Singleton Instance
 # We assume the code runs from the 'backend' folder, so path is ./data/...
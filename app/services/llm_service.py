@@ -1,7 +1,90 @@
 from groq import Groq
 import google.generativeai as genai
 import random
+import asyncio
+import datetime
+import hashlib
+import re
+import threading
+import time
 from app.core.settings import settings
+from app.agent.prompts import estimate_tokens
+
+class PromptStats:
+    """
+    Per-template token accounting plus a local registry of system prefixes.
+    A prefix "hit" means the exact same static prefix was already sent, i.e.
+    the provider's prefix cache can serve it instead of re-processing it.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.templates = {}
+        self.prefixes = {}
+
+    def observe(self, template: str, messages: list):
+        system = "".join(m["content"] for m in messages if m["role"] == "system")
+        total = sum(estimate_tokens(m["content"]) for m in messages)
+        prefix_tokens = estimate_tokens(system) if system else 0
+        digest = hashlib.sha256(system.encode("utf-8")).hexdigest()[:16] if system else None
+
+        with self._lock:
+            stats = self.templates.setdefault(template or "untagged", {
+                "calls": 0, "estimated_prompt_tokens": 0, "estimated_prefix_tokens": 0,
+                "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0,
+                "prefix_hits": 0, "prefix_misses": 0
+            })
+            stats["calls"] += 1
+            stats["estimated_prompt_tokens"] += total
+            stats["estimated_prefix_tokens"] += prefix_tokens
+            if digest:
+                if digest in self.prefixes:
+                    self.prefixes[digest] += 1
+                    stats["prefix_hits"] += 1
+                else:
+                    self.prefixes[digest] = 1
+                    stats["prefix_misses"] += 1
+
+    def record_usage(self, template: str, usage):
+        """`usage` is the provider-reported usage normalized by `_usage_of`."""
+        if not usage: return
+        with self._lock:
+            stats = self.templates.get(template or "untagged")
+            if stats is None: return
+            stats["prompt_tokens"] += usage["prompt_tokens"]
+            stats["completion_tokens"] += usage["completion_tokens"]
+            stats["cached_tokens"] += usage["cached_tokens"]
+
+    def report(self):
+        with self._lock:
+            return {
+                "templates": {name: dict(stats) for name, stats in self.templates.items()},
+                "distinct_prefixes": len(self.prefixes)
+            }
+
+def _usage_of(response):
+    """Normalizes Groq (OpenAI-style) and wrapped Gemini usage into one dict."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        # Groq reports stream usage on the last chunk, under x_groq
+        usage = getattr(getattr(response, "x_groq", None), "usage", None)
+    if usage is None: return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_tokens": (getattr(details, "cached_tokens", 0) if details else getattr(usage, "cached_tokens", 0)) or 0
+    }
+
+def _gemini_usage(response):
+    meta = getattr(response, "usage_metadata", None)
+    return SimpleNamespace(
+        prompt_tokens=getattr(meta, "prompt_token_count", 0),
+        completion_tokens=getattr(meta, "candidates_token_count", 0),
+        cached_tokens=getattr(meta, "cached_content_token_count", 0)
+    ) if meta else None
+
+# Versioned Gemini ids ("gemini-1.5-flash-001"); context caching rejects aliases
+_PINNED_GEMINI_MODEL = re.compile(r"-\d{3}$")
 
 class LLMService:
     def __init__(self):
@@ -10,6 +93,11 @@ class LLMService:
         
         self.groq_clients = []
         self.gemini_clients = [] # We just store keys for Gemini, as the client is global usually, but we can manage instances if needed.
+
+        self.prompt_stats = PromptStats()
+        # (key, model, prefix hash) -> (CachedContent or None after a failed create, expires_at)
+        self._gemini_caches = {}
+        self._gemini_cache_lock = threading.Lock()
         
         self._init_clients()
         
@@ -18,7 +106,12 @@ class LLMService:
         if self.groq_keys:
             for key in self.groq_keys:
                 try:
-                    client = Groq(api_key=key, timeout=30.0)
+                    client = Groq(
+                        api_key=key,
+                        base_url=settings.GROQ_BASE_URL,
+                        timeout=settings.LLM_TIMEOUT,
+                        max_retries=settings.LLM_MAX_RETRIES
+                    )
                     self.groq_clients.append(client)
                 except Exception as e:
                     print(f"⚠️ Failed to init Groq key {key[:5]}...: {e}")
@@ -29,6 +122,11 @@ class LLMService:
              self.gemini_clients = self.gemini_keys
              print(f"✨ LLM Service: Loaded {len(self.gemini_clients)} Gemini keys.")
 
+    @property
+    def primary_model(self):
+        """Model that answers when the fallback chain is not needed."""
+        return settings.LLM_MODEL if self.groq_clients else settings.GEMINI_MODEL
+
     def get_groq_client(self):
         if not self.groq_clients: return None
         return random.choice(self.groq_clients)
@@ -37,15 +135,28 @@ class LLMService:
         if not self.gemini_clients: return None
         return random.choice(self.gemini_clients)
 
-    async def generate_response(self, messages: list, temperature: float = 0.1, json_mode: bool = False, stream: bool = False, provider: str = "groq"):
+    async def generate_response(self, messages: list, temperature: float = 0.1, json_mode: bool = False, stream: bool = False, provider: str = "groq", template: str = None):
         """
         Generates response with automatic fallback: Groq -> Gemini -> Fail
+        `template` names the prompt (see prompts.TEMPLATES) for token accounting.
         """
-        
+        self.prompt_stats.observe(template, messages)
+        response = await self._generate(messages, temperature, json_mode, stream, provider)
+        if stream:
+            # Recorded from the last chunk that carries usage, once the stream has been read
+            response.on_usage = lambda usage: self.prompt_stats.record_usage(template, usage)
+        else:
+            self.prompt_stats.record_usage(template, _usage_of(response))
+        return response
+
+    def usage_report(self):
+        return self.prompt_stats.report()
+
+    async def _generate(self, messages, temperature, json_mode, stream, provider):
         # 1. Try Primary Provider (Groq)
         try:
             if provider == "groq" and self.groq_clients:
-                return self._call_groq(messages, temperature, json_mode, stream)
+                return await asyncio.to_thread(self._call_groq, messages, temperature, json_mode, stream)
         except Exception as e:
             print(f"⚠️ Groq Failed: {e}. Switching to Gemini...")
         
@@ -53,7 +164,7 @@ class LLMService:
         try:
             if self.gemini_clients:
                 print("🔄 Using Gemini Fallback...")
-                return self._call_gemini(messages, temperature, json_mode, stream)
+                return await asyncio.to_thread(self._call_gemini, messages, temperature, json_mode, stream)
         except Exception as e:
             print(f"⚠️ Gemini Failed: {e}")
             
@@ -61,12 +172,60 @@ class LLMService:
         if provider == "gemini" and self.groq_clients:
              try:
                 print("🔄 Switching to Groq...")
-                return self._call_groq(messages, temperature, json_mode, stream)
+                return await asyncio.to_thread(self._call_groq, messages, temperature, json_mode, stream)
              except Exception as e:
                  print(f"⚠️ Groq Failed: {e}")
 
         raise Exception("❌ All LLM Providers failed. Please check your API keys or internet connection.")
 
+    async def iterate_stream(self, stream):
+        """
+        Async iterator over a blocking provider stream (Groq or Gemini wrapper).
+        Chunks are read on a worker thread so the event loop is never blocked;
+        at most LLM_STREAM_BUFFER chunks are read ahead of the consumer, so a
+        slow client slows the provider read instead of piling up memory.
+        Closing this iterator (e.g. client disconnect) closes the upstream stream.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=settings.LLM_STREAM_BUFFER)
+        stop = threading.Event()
+        end = object()
+
+        def put(item):
+            # Blocks the reader while the queue is full, so a slow client slows the upstream read
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        def reader():
+            try:
+                try:
+                    for chunk in stream:
+                        if stop.is_set(): break
+                        put(chunk)
+                except Exception as e:
+                    if not stop.is_set(): put(e)
+                put(end)
+            except BaseException:
+                pass # Loop closed or consumer gone; nobody is reading any more
+
+        threading.Thread(target=reader, daemon=True).start()
+        try:
+            while True:
+                item = await queue.get()
+                if item is end: break
+                if isinstance(item, Exception): raise item
+                yield item
+        finally:
+            stop.set()
+            # Unblock a reader waiting on a full queue so it can see `stop`
+            while not queue.empty():
+                queue.get_nowait()
+            close = getattr(stream, "close", None)
+            if close:
+                try:
+                    close()
+                except Exception:
+                    pass # Generator still running on the reader thread; it stops at the next chunk
+
     def _call_groq(self, messages, temperature, json_mode, stream):
         client = self.get_groq_client()
         kwargs = {
@@ -75,18 +234,23 @@ class LLMService:
             "temperature": temperature
         }
         if json_mode: kwargs["response_format"] = {"type": "json_object"}
-        if stream: kwargs["stream"] = True
+        if stream:
+            kwargs["stream"] = True
+            return ProviderStream(client.chat.completions.create(**kwargs), "groq", settings.LLM_MODEL)
         return client.chat.completions.create(**kwargs)
 
     def _call_gemini(self, messages, temperature, json_mode, stream):
         # Configure the key for this request
         key = self.get_gemini_key()
-        genai.configure(api_key=key)
+        if settings.GEMINI_API_ENDPOINT:
+            genai.configure(api_key=key, transport="rest", client_options={"api_endpoint": settings.GEMINI_API_ENDPOINT})
+        else:
+            genai.configure(api_key=key)
         
         # Convert OpenAI messages to Gemini format
         # System prompt -> system_instruction if possible, or merged into history
         # Gemini 1.5 Pro or Flash
-        model_name = "gemini-1.5-flash" 
+        model_name = settings.GEMINI_MODEL
         
         system_instruction = None
         contents = []
@@ -99,7 +263,11 @@ class LLMService:
             elif msg['role'] == 'assistant':
                 contents.append({"role": "model", "parts": [msg['content']]})
 
-        model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+        model = None
+        if system_instruction and settings.GEMINI_CONTEXT_CACHE:
+            model = self._gemini_cached_model(key, model_name, system_instruction)
+        if model is None:
+            model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
         
         generation_config = genai.types.GenerationConfig(
             temperature=temperature,
@@ -108,20 +276,93 @@ class LLMService:
 
         if stream:
             # Gemini stream response
-            response = model.generate_content(contents, stream=True, generation_config=generation_config)
+            response = model.generate_content(contents, stream=True, generation_config=generation_config,
+                                              request_options={"timeout": settings.LLM_TIMEOUT})
             # We need to wrap this in a generator that matches OpenAI style chunks for the Orchestrator
-            return self._gemini_stream_wrapper(response)
+            return ProviderStream(self._gemini_stream_wrapper(response), "gemini", model_name)
         
-        response = model.generate_content(contents, generation_config=generation_config)
+        response = model.generate_content(contents, generation_config=generation_config,
+                                          request_options={"timeout": settings.LLM_TIMEOUT})
         
         # Mock OpenAI response object for compatibility
-        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=response.text))])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=response.text))], usage=_gemini_usage(response))
+
+    def _gemini_cached_model(self, key, model_name, system_instruction):
+        """
+        Returns a model bound to a Gemini CachedContent holding the static system
+        prefix, creating the cache on first use. Returns None when the prefix is
+        too small for context caching or the API rejects it; callers then send
+        the system instruction inline as before.
+        """
+        if estimate_tokens(system_instruction) < settings.GEMINI_CACHE_MIN_TOKENS:
+            return None
+        if not _PINNED_GEMINI_MODEL.search(model_name):
+            return None # Aliases like "gemini-1.5-flash" can't be cached
+
+        digest = hashlib.sha256(system_instruction.encode("utf-8")).hexdigest()
+        cache_key = (key, model_name, digest)
+        with self._gemini_cache_lock:
+            entry = self._gemini_caches.get(cache_key)
+        if entry and entry[1] > time.time():
+            if entry[0] is None:
+                return None # Recent create failed; retried after GEMINI_CACHE_RETRY_AFTER
+            return genai.GenerativeModel.from_cached_content(cached_content=entry[0])
+
+        # Network call outside the lock; concurrent misses may each create a cache, the last one is kept
+        ttl = settings.GEMINI_CACHE_TTL
+        try:
+            cached = genai.caching.CachedContent.create(
+                model=f"models/{model_name}",
+                system_instruction=system_instruction,
+                ttl=datetime.timedelta(seconds=ttl)
+            )
+        except Exception as e:
+            print(f"⚠️ Gemini context cache unavailable: {e}")
+            with self._gemini_cache_lock:
+                self._gemini_caches[cache_key] = (None, time.time() + settings.GEMINI_CACHE_RETRY_AFTER)
+            return None
+
+        with self._gemini_cache_lock:
+            # Refresh a bit before the server-side expiry
+            self._gemini_caches[cache_key] = (cached, time.time() + ttl * 0.9)
+        print(f"🗄️ Gemini: Cached system prefix {digest[:8]}.")
+        return genai.GenerativeModel.from_cached_content(cached_content=cached)
 
     def _gemini_stream_wrapper(self, response_stream):
         """Yields objects with .choices[0].delta.content to match Groq/OpenAI format"""
+        usage = None
         for chunk in response_stream:
+             usage = _gemini_usage(chunk) or usage
              if chunk.text:
                  yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=chunk.text))])
+        if usage:
+            # Totals are final on the last chunk; pass them on as an OpenAI-style usage chunk
+            yield SimpleNamespace(choices=[], usage=usage)
+
+class ProviderStream:
+    """
+    A blocking chunk stream tagged with the provider and model that actually
+    serve it. `on_usage` is called with the provider-reported usage once the
+    stream has been read to the end.
+    """
+
+    def __init__(self, stream, provider, model):
+        self.stream = stream
+        self.provider = provider
+        self.model = model
+        self.on_usage = None
+
+    def __iter__(self):
+        usage = None
+        for chunk in self.stream:
+            usage = _usage_of(chunk) or usage
+            yield chunk
+        if usage and self.on_usage:
+            self.on_usage(usage)
+
+    def close(self):
+        close = getattr(self.stream, "close", None)
+        if close: close()
 
 # Helper class for mocking
 class SimpleNamespace:
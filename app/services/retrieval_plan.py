@@ -0,0 +1,37 @@
+"""
+Retrieval planning from request filters. No Chroma or model imports, so callers
+can decide on a plan without loading the vector service.
+"""
+
+# Chapters split into sections (Gadhada I/II/III); elsewhere chapter + number is unique
+SECTIONED_CHAPTERS = {"Gadhada"}
+
+def filter_equalities(filters: dict):
+    """Flattens a Chroma `where` of simple equalities into {field: value}; None if it has anything else."""
+    conditions = filters.get("$and", [filters]) if filters else []
+    fields = {}
+    for cond in conditions:
+        if len(cond) != 1: return None
+        (field, value), = cond.items()
+        if field.startswith("$"): return None
+        if isinstance(value, dict):
+            if list(value) != ["$eq"]: return None
+            value = value["$eq"]
+        fields[field] = value
+    return fields
+
+def plan(filters: dict = None):
+    """
+    Picks the cheapest retrieval strategy for a request:
+    - "direct": filters pin one discourse -> fetch its chunks by metadata, no embedding
+    - "filtered_ann": partial filters (e.g. a chapter) -> ANN search inside the filter
+    - "adaptive_ann": no filters -> ANN search with k chosen from the score distribution
+    """
+    if not filters:
+        return "adaptive_ann"
+    fields = filter_equalities(filters) or {}
+    if "chapter" in fields and "vachanamrut_no" in fields and (
+        "section" in fields or fields["chapter"] not in SECTIONED_CHAPTERS
+    ):
+        return "direct"
+    return "filtered_ann"
@@ -0,0 +1,114 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from app.core.settings import settings
+
+
+class MemoryBackend:
+    """Process-local LRU. Fast, but each worker has its own view."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: dict):
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+class SQLiteBackend:
+    """File-backed store shared by every worker on the host."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._writes = 0
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT state FROM sessions WHERE id = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, entry: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, state, updated_at) VALUES (?, ?, ?)",
+                (key, json.dumps(entry, ensure_ascii=False), entry["updated_at"])
+            )
+            self._writes += 1
+            # Trim to the newest `max_entries` now and then, not on every write
+            if self._writes % 100 == 0:
+                self._conn.execute(
+                    "DELETE FROM sessions WHERE id NOT IN (SELECT id FROM sessions ORDER BY updated_at DESC LIMIT ?)",
+                    (self.max_entries,)
+                )
+            self._conn.commit()
+
+
+class SessionStore:
+    """
+    Server-side conversation state, keyed by conversation id.
+
+    Each entry keeps the recent transcript plus what the last turn resolved
+    (routing metadata, language, ranked passages) so follow-up turns can skip
+    routing and retrieval.
+    """
+
+    def __init__(self, backend: str, max_entries: int, ttl: float, db_path: str = None):
+        self.ttl = ttl
+        if backend == "sqlite":
+            self.backend = SQLiteBackend(db_path, max_entries)
+        else:
+            self.backend = MemoryBackend(max_entries)
+        print(f"💬 Session Store: Using {backend} backend.")
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex
+
+    def get(self, conversation_id: str):
+        if not conversation_id:
+            return None
+        entry = self.backend.get(conversation_id)
+        if entry is None or time.time() - entry["updated_at"] > self.ttl:
+            return None
+        return entry
+
+    def save(self, conversation_id: str, history: list, routing_meta: dict, language: str, passages: dict):
+        self.backend.put(conversation_id, {
+            "history": history[-settings.SESSION_MAX_MESSAGES:],
+            "routing_meta": routing_meta or {},
+            "language": language,
+            "passages": passages,
+            "updated_at": time.time()
+        })
+
+
+session_store = SessionStore(
+    backend=settings.SESSION_BACKEND,
+    max_entries=settings.SESSION_MAX_ENTRIES,
+    ttl=settings.SESSION_TTL,
+    db_path=settings.SESSION_DB_PATH
+)
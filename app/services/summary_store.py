@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import threading
+from app.core.settings import settings
+
+LANGUAGES = ("en", "hi", "gu")
+
+KEY_TEACHINGS_HEADING = {
+    "en": "Key Teachings",
+    "hi": "मुख्य शिक्षाएँ",
+    "gu": "મુખ્ય ઉપદેશો",
+}
+
+
+def discourse_key(chapter: str, section: str, number: int):
+    # Same (chapter, section, number) identity as Librarian.get_full_text
+    return f"{chapter}|{section or ''}|{int(number)}"
+
+
+def source_hash(item: dict):
+    """Hash of the Librarian record; any edit to the source text invalidates its summaries."""
+    payload = json.dumps(item, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SummaryStore:
+    """
+    Precomputed per-discourse summaries and key-teaching bullets (en/hi/gu),
+    built offline by `python -m app.pipelines.summarize` and served at request
+    time without any LLM call.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.discourses = {}
+        # key -> (Librarian item, source_hash): items are loaded once, so each is hashed once
+        self._item_hashes = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.discourses = json.load(f).get("discourses", {})
+            print(f"📜 Summary Store: Loaded {len(self.discourses)} discourses.")
+
+    def save(self):
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "discourses": self.discourses}, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+    def _source_hash(self, key: str, item: dict):
+        cached = self._item_hashes.get(key)
+        if cached is not None and cached[0] is item:
+            return cached[1]
+        digest = source_hash(item)
+        self._item_hashes[key] = (item, digest)
+        return digest
+
+    def get(self, item: dict, language: str):
+        """Returns {"summary", "key_teachings"} if stored and still valid for `item`'s text."""
+        key = discourse_key(item.get("chapter"), item.get("section"), item.get("vachanamrut_no"))
+        entry = self.discourses.get(key)
+        if not entry or entry["source_hash"] != self._source_hash(key, item):
+            return None
+        return entry["languages"].get(language)
+
+    def put(self, item: dict, language: str, summary: str, key_teachings: list):
+        key = discourse_key(item.get("chapter"), item.get("section"), item.get("vachanamrut_no"))
+        digest = self._source_hash(key, item)
+        with self._lock:
+            entry = self.discourses.get(key)
+            if not entry or entry["source_hash"] != digest:
+                entry = {"source_hash": digest, "languages": {}}
+                self.discourses[key] = entry
+            entry["languages"][language] = {"summary": summary, "key_teachings": key_teachings}
+
+    @staticmethod
+    def render(summary: dict, language: str):
+        bullets = "\n".join(f"- {point}" for point in summary["key_teachings"])
+        heading = KEY_TEACHINGS_HEADING.get(language, KEY_TEACHINGS_HEADING["en"])
+        return f"{summary['summary']}\n\n**{heading}**\n{bullets}"
+
+
+summary_store = SummaryStore(path=settings.SUMMARY_STORE_PATH)
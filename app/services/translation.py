@@ -0,0 +1,121 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable
+from app.core.settings import settings
+from app.services import glossary
+
+_TOKEN = re.compile(r"[^\s?!.,।;:]+")
+
+
+def normalize(text: str):
+    return " ".join(text.split()).strip()
+
+
+class TranslationCache:
+    """SQLite-backed source -> English cache, shared by every worker on the host."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations (source TEXT PRIMARY KEY, translation TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, source: str):
+        with self._lock:
+            row = self._conn.execute("SELECT translation FROM translations WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, source: str, translation: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (source, translation, created_at) VALUES (?, ?, ?)",
+                (source, translation, time.time())
+            )
+            self._conn.commit()
+
+
+class Translator:
+    """
+    Query translation (hi/gu -> en) in three tiers, cheapest first:
+    1. Glossary: short queries made of scripture terms ("માયા એટલે શું?").
+    2. Persistent cache of earlier LLM translations.
+    3. The LLM, for real sentence-level translation (result is cached).
+    """
+
+    def __init__(self, cache_path: str):
+        self.cache = TranslationCache(cache_path)
+        self.stats = {"glossary": 0, "cache": 0, "llm": 0}
+        # Longest terms first so "એકાંતિક ધર્મ" wins over "ધર્મ"
+        self._phrases = sorted((t for t in glossary.TERMS if " " in t), key=len, reverse=True)
+
+    def _term(self, word: str):
+        if word in glossary.TERMS:
+            return glossary.TERMS[word]
+        for suffix in glossary.GUJARATI_SUFFIXES:
+            if word.endswith(suffix) and word[:-len(suffix)] in glossary.TERMS:
+                return glossary.TERMS[word[:-len(suffix)]]
+        return None
+
+    def translate_locally(self, text: str):
+        """
+        Returns "What is <term>?" when the query is a single glossary term (plus
+        question / filler words), or several terms joined by "અને" / "और".
+        Anything else - unknown words, or terms related to each other
+        ("ભગવાનની મૂર્તિ") - needs the LLM, so None is returned.
+        """
+        for phrase in self._phrases:
+            text = text.replace(phrase, phrase.replace(" ", "_"))
+
+        terms = []
+        joined = False
+        for word in _TOKEN.findall(text):
+            word = word.replace("_", " ")
+            if word in glossary.CONJUNCTIONS:
+                joined = True
+                continue
+            if word in glossary.WHAT_WORDS or word in glossary.FILLER_WORDS:
+                continue
+            term = self._term(word)
+            if term is None or (terms and not joined):
+                return None
+            if term not in terms:
+                terms.append(term)
+            joined = False
+
+        if not terms or joined or len(terms) > settings.TRANSLATION_LOCAL_MAX_TERMS:
+            return None
+        return f"What is {' and '.join(terms)}?"
+
+    async def translate(self, text: str, llm_translate: Callable[[str], Awaitable[str]]):
+        source = normalize(text)
+
+        local = self.translate_locally(source)
+        if local:
+            self.stats["glossary"] += 1
+            return local
+
+        cached = self.cache.get(source)
+        if cached:
+            self.stats["cache"] += 1
+            return cached
+
+        translation = await llm_translate(source)
+        self.stats["llm"] += 1
+        if translation:
+            self.cache.put(source, translation.strip())
+        return translation
+
+    def report(self):
+        total = sum(self.stats.values())
+        without_llm = self.stats["glossary"] + self.stats["cache"]
+        return dict(self.stats, total=total, percent_without_llm=round(100 * without_llm / total, 1) if total else 0.0)
+
+
+translator = Translator(cache_path=settings.TRANSLATION_CACHE_PATH)
@@ -1,24 +1,30 @@
 import chromadb
-from chromadb.utils import embedding_functions
+from app.core import profiling
 from app.core.settings import settings
+from app.services.embeddings import get_embedding_function
+from app.services import retrieval_plan
+
+def _chunk_number(chunk_id: str):
+    # Ids end in the chunk number: "<chapter>_<section>_<no>_<chunk>"
+    tail = chunk_id.rsplit("_", 1)[-1]
+    return int(tail) if tail.isdigit() else 0
 
 class VectorService:
     def __init__(self):
         self.client = None
         self.collection = None
+        self.ef = None
         self._connect()
 
     def _connect(self):
         try:
-            # Initialize Embedding Function
-            self.ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-                model_name=settings.EMBEDDING_MODEL
-            )
+            # Initialize Embedding Function (backend from settings.EMBEDDING_BACKEND)
+            self.ef = get_embedding_function()
             # Initialize Client
             self.client = chromadb.PersistentClient(path=settings.VECTOR_DB_PATH)
             # Get Collection
             self.collection = self.client.get_collection(
-                name="vachanamrut_rag", 
+                name=settings.COLLECTION_NAME, 
                 embedding_function=self.ef
             )
             print("🧠 Vector DB: Connected successfully.")
@@ -27,14 +33,82 @@ class VectorService:
             self.client = None
             self.collection = None
 
-    def search(self, query: str, filters: dict = None, n_results: int = 5):
+    def plan(self, filters: dict = None):
+        return retrieval_plan.plan(filters)
+
+    def search(self, query: str, filters: dict = None, n_results: int = None):
+        """
+        Returns Chroma query-shaped results (lists of lists) plus `plan`, the
+        strategy that ran. Passing `n_results` forces a fixed-k ANN search.
+        """
         if not self.collection:
             return None
-            
-        return self.collection.query(
-            query_texts=[query],
-            n_results=n_results,
-            where=filters
+
+        plan = self.plan(filters) if n_results is None else "fixed_ann"
+        print(f"🔎 Vector DB: Plan '{plan}' for filters {filters}")
+
+        results = None
+        if plan == "direct":
+            results = self._fetch_discourse(filters)
+            if results is None:
+                # Too long to send whole: rank its chunks instead of cutting by position
+                plan = "filtered_ann"
+        if plan == "adaptive_ann":
+            results = self._adaptive_query(query)
+        elif results is None:
+            embedding = self._embed(query)
+            with profiling.stage("ann_search"):
+                results = self.collection.query(
+                    query_embeddings=embedding,
+                    n_results=n_results or settings.SEARCH_DEFAULT_K,
+                    where=filters
+                )
+        results["plan"] = plan
+        return results
+
+    def _embed(self, query: str):
+        # Embedded here rather than via query_texts so tokenizer/model time is measurable
+        with profiling.stage("embed_query"):
+            return self.ef([query])
+
+    def _fetch_discourse(self, filters: dict):
+        """The whole discourse in reading order, or None if it has more than DIRECT_FETCH_MAX_CHUNKS chunks."""
+        with profiling.stage("metadata_fetch"):
+            # One row past the limit is enough to tell the discourse is too long
+            got = self.collection.get(where=filters, include=["documents", "metadatas"],
+                                      limit=settings.DIRECT_FETCH_MAX_CHUNKS + 1)
+        if len(got["ids"]) > settings.DIRECT_FETCH_MAX_CHUNKS:
+            return None
+        rows = sorted(
+            zip(got["ids"], got["documents"], got["metadatas"]),
+            key=lambda row: _chunk_number(row[0])
         )
+        return {
+            "ids": [[r[0] for r in rows]],
+            "documents": [[r[1] for r in rows]],
+            "metadatas": [[r[2] for r in rows]],
+            "distances": None
+        }
+
+    def _adaptive_query(self, query: str):
+        embedding = self._embed(query)
+        with profiling.stage("ann_search"):
+            results = self.collection.query(query_embeddings=embedding, n_results=settings.SEARCH_MAX_K)
+        distances = (results.get("distances") or [[]])[0]
+        if not distances:
+            return results
+
+        # Keep the cluster close to the best hit: a sharp drop-off keeps few
+        # passages, a flat distribution (ambiguous query) keeps more.
+        best, worst = distances[0], distances[-1]
+        cutoff = best + settings.SEARCH_SCORE_MARGIN * (worst - best)
+        k = settings.SEARCH_MIN_K
+        while k < len(distances) and distances[k] <= cutoff:
+            k += 1
+
+        for key in ("ids", "documents", "metadatas", "distances"):
+            if results.get(key):
+                results[key] = [results[key][0][:k]]
+        return results
 
 vector_service = VectorService()
@@ -0,0 +1,323 @@
+"""
+Load + chaos test for the Groq -> Gemini -> Groq fallback chain.
+
+Starts the fault-injecting provider stand-ins (loadtest/fake_providers.py) and
+the API (uvicorn, pointed at the stand-ins), then drives concurrent /ask
+traffic through three phases:
+
+1. baseline - both providers healthy
+2. degraded - the chosen provider(s) return 429s / 5xx, slow down and drop
+   streams part-way through
+3. healed   - faults removed; measures how long until answers are fast again
+
+and checks the SLOs:
+- error rate in every phase <= --max-error-rate
+- fallback overhead (degraded p95 - baseline p95 latency) <= --max-fallback-overhead
+- recovery time (heal -> first run of --recovery-streak fast, successful
+  requests) <= --max-recovery
+- the degraded provider(s) actually served streamed answers during the
+  degraded phase, and cut some of them when --rate-disconnect > 0
+
+Exits with status 1 when an SLO is missed. Retrieval is real, so the vector DB
+and corpus must be built (see README).
+
+Usage:
+    python -m loadtest.chaos
+    python -m loadtest.chaos --concurrency 32 --degraded 120 --degrade both --rate-5xx 0.5
+    python -m loadtest.chaos --app-url http://127.0.0.1:8000   # app already started against the stand-ins
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlsplit
+
+from loadtest.fake_providers import Faults, start_fake_providers
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUESTIONS = [
+    "How does a devotee overcome maya?",
+    "What is ekantik dharma?",
+    "Why is the company of the Satpurush important?",
+    "What does the Vachanamrut say about detachment?",
+    "How should one meditate on the murti of God?",
+]
+
+
+@dataclass
+class Result:
+    started: float
+    latency: float
+    ok: bool
+    first_token: Optional[float] = None
+    error: Optional[str] = None
+
+
+def ask(host, port, question, timeout):
+    """Sends one /ask request and reads the SSE stream to the end."""
+    started = time.perf_counter()
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    first_token, error, done = None, None, False
+    try:
+        conn.request("POST", "/ask", body=json.dumps({"question": question, "history": []}),
+                     headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        if response.status != 200:
+            error = f"HTTP {response.status}"
+        else:
+            for line in response:
+                if not line.startswith(b"data: "):
+                    continue
+                data = line[6:].strip()
+                if data == b"[DONE]":
+                    done = True
+                    break
+                chunk = json.loads(data)
+                if "error" in chunk:
+                    error = chunk["error"][:120]
+                elif chunk.get("type") == "token" and first_token is None:
+                    first_token = time.perf_counter() - started
+            if not done and error is None:
+                error = "stream ended without [DONE]"
+    except (OSError, http.client.HTTPException, ValueError) as e:
+        error = f"{type(e).__name__}: {e}"[:120]
+    finally:
+        conn.close()
+
+    ok = error is None and first_token is not None
+    if error is None and not ok:
+        error = "no answer tokens"
+    return Result(started=started, latency=time.perf_counter() - started, ok=ok, first_token=first_token, error=error)
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def summarize(results):
+    ok = [r for r in results if r.ok]
+    errors = {}
+    for r in results:
+        if not r.ok:
+            errors[r.error] = errors.get(r.error, 0) + 1
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "error_rate": (len(results) - len(ok)) / len(results) if results else 0.0,
+        "p50": percentile([r.latency for r in ok], 50),
+        "p95": percentile([r.latency for r in ok], 95),
+        "ttft_p50": percentile([r.first_token for r in ok], 50),
+        "top_errors": sorted(errors.items(), key=lambda kv: -kv[1])[:3],
+    }
+
+
+def recovery_time(results, healed_at, fast, streak):
+    """Seconds from healing until the first `streak` consecutive requests (started after healing) are all fast and successful."""
+    after = sorted((r for r in results if r.started >= healed_at), key=lambda r: r.started)
+    for i in range(len(after) - streak + 1):
+        if all(r.ok and r.latency <= fast for r in after[i:i + streak]):
+            return after[i].started - healed_at
+    return float("inf")
+
+
+class Load:
+    """`concurrency` virtual users sending /ask back to back until stopped."""
+
+    def __init__(self, url, concurrency, timeout):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.results = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _user(self, n):
+        i = 0
+        while not self._stop.is_set():
+            # Unique question text; the stand-ins echo it into the rewritten search query,
+            # so every request gets its own answer-cache key and a real provider stream
+            question = f"{QUESTIONS[(n + i) % len(QUESTIONS)]} (user {n}, request {i})"
+            result = ask(self.host, self.port, question, self.timeout)
+            with self._lock:
+                self.results.append(result)
+            i += 1
+
+    def start(self):
+        for n in range(self.concurrency):
+            thread = threading.Thread(target=self._user, args=(n,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(self.timeout)
+
+    def between(self, start, end):
+        with self._lock:
+            return [r for r in self.results if start <= r.started < end]
+
+
+def start_app(port, groq_url, gemini_url, concurrency):
+    env = dict(os.environ)
+    env.update(GROQ_API_KEY="chaos-key", GEMINI_API_KEYS="chaos-key",
+               GROQ_BASE_URL=groq_url, GEMINI_API_ENDPOINT=gemini_url, GEMINI_CONTEXT_CACHE="0")
+    # Production admission limits model the real Groq quota; the harness measures the fallback chain instead
+    env.setdefault("GROQ_RPM_PER_KEY", "1000000")
+    env.setdefault("CONCURRENCY_PER_KEY", str(concurrency))
+    # All virtual users share one client address
+    env.setdefault("CLIENT_REQUESTS_PER_MIN", "1000000")
+    env.setdefault("CLIENT_BURST", str(concurrency))
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env
+    )
+
+
+def wait_healthy(url, timeout):
+    parts = urlsplit(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=5)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(1)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load + chaos test for the LLM provider fallback chain")
+    parser.add_argument("--app-url", default=None, help="Use a running app instead of starting one")
+    parser.add_argument("--app-port", type=int, default=8765)
+    parser.add_argument("--groq-port", type=int, default=9001)
+    parser.add_argument("--gemini-port", type=int, default=9002)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Client timeout per /ask request")
+
+    parser.add_argument("--baseline", type=float, default=30.0, help="Seconds")
+    parser.add_argument("--degraded", type=float, default=60.0, help="Seconds")
+    parser.add_argument("--healed", type=float, default=60.0, help="Seconds")
+
+    parser.add_argument("--degrade", choices=["groq", "gemini", "both"], default="groq")
+    parser.add_argument("--latency", type=float, default=1.0, help="Degraded: seconds before each response")
+    parser.add_argument("--rate-429", type=float, default=0.3)
+    parser.add_argument("--rate-5xx", type=float, default=0.2)
+    parser.add_argument("--rate-disconnect", type=float, default=0.02, help="Degraded: share of bodies cut mid-stream")
+
+    parser.add_argument("--max-error-rate", type=float, default=0.05)
+    parser.add_argument("--max-fallback-overhead", type=float, default=5.0, help="Seconds added to p95 while degraded")
+    parser.add_argument("--max-recovery", type=float, default=15.0, help="Seconds after healing")
+    parser.add_argument("--recovery-streak", type=int, default=5)
+    parser.add_argument("--report", default=None, help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    groq, gemini = start_fake_providers(args.groq_port, args.gemini_port, Faults(), Faults())
+    degraded = {"groq": [groq], "gemini": [gemini], "both": [groq, gemini]}[args.degrade]
+    print(f"🧪 Stand-ins: GROQ_BASE_URL={groq.url} GEMINI_API_ENDPOINT={gemini.url}")
+
+    app = None
+    url = args.app_url
+    if url is None:
+        url = f"http://127.0.0.1:{args.app_port}"
+        app = start_app(args.app_port, groq.url, gemini.url, args.concurrency)
+    try:
+        if not wait_healthy(url, timeout=300):
+            print(f"❌ App at {url} did not become healthy.")
+            return 1
+
+        load = Load(url, args.concurrency, args.timeout)
+        t0 = time.perf_counter()
+        load.start()
+
+        print(f"📈 Baseline: {args.baseline:.0f}s at concurrency {args.concurrency}")
+        time.sleep(args.baseline)
+        t1 = time.perf_counter()
+        before = [server.counts_snapshot() for server in degraded]
+        print(f"💥 Degrading {args.degrade}: latency {args.latency}s, 429 {args.rate_429:.0%}, "
+              f"5xx {args.rate_5xx:.0%}, disconnect {args.rate_disconnect:.0%}")
+        for server in degraded:
+            server.faults.update(latency=args.latency, rate_429=args.rate_429,
+                                 rate_5xx=args.rate_5xx, rate_disconnect=args.rate_disconnect)
+        time.sleep(args.degraded)
+        t2 = time.perf_counter()
+        after = [server.counts_snapshot() for server in degraded]
+        print("🩹 Healing providers")
+        for server in degraded:
+            server.faults.heal()
+        time.sleep(args.healed)
+        t3 = time.perf_counter()
+        load.stop()
+
+        phases = {
+            "baseline": summarize(load.between(t0, t1)),
+            "degraded": summarize(load.between(t1, t2)),
+            "healed": summarize(load.between(t2, t3)),
+        }
+        fast = phases["baseline"]["p95"] * 1.5
+        recovery = recovery_time(load.between(t2, t3), t2, fast, args.recovery_streak)
+        overhead = phases["degraded"]["p95"] - phases["baseline"]["p95"]
+
+        def degraded_delta(what):
+            return sum(a.get(what, 0) - b.get(what, 0) for a, b in zip(after, before))
+
+        degraded_streams = degraded_delta("stream_requests")
+        degraded_cuts = degraded_delta("stream_disconnect")
+    finally:
+        if app is not None:
+            app.terminate()
+            app.wait(30)
+
+    print(f"\n{'phase':<10}{'requests':>9}{'errors':>8}{'err %':>8}{'p50 s':>8}{'p95 s':>8}{'ttft p50':>10}")
+    for name, s in phases.items():
+        print(f"{name:<10}{s['requests']:>9}{s['errors']:>8}{s['error_rate']:>8.1%}{s['p50']:>8.2f}{s['p95']:>8.2f}{s['ttft_p50']:>10.2f}")
+        for error, count in s["top_errors"]:
+            print(f"{'':<10}{count:>5} x {error}")
+    print(f"\nProvider calls: groq {groq.counts_snapshot()}, gemini {gemini.counts_snapshot()}")
+    print(f"Fallback overhead (p95): {overhead:+.2f}s, recovery: {recovery:.1f}s")
+    print(f"Degraded phase: {degraded_streams} streamed calls to {args.degrade}, {degraded_cuts} cut mid-stream")
+
+    checks = [(f"{name} error rate <= {args.max_error_rate:.0%}", s["error_rate"] <= args.max_error_rate)
+              for name, s in phases.items()]
+    checks.append((f"fallback overhead <= {args.max_fallback_overhead}s", overhead <= args.max_fallback_overhead))
+    checks.append((f"recovery <= {args.max_recovery}s", recovery <= args.max_recovery))
+    # Without streams to the degraded provider the fault injection tested nothing
+    checks.append((f"degraded {args.degrade} served streams", degraded_streams > 0))
+    if args.rate_disconnect > 0:
+        checks.append(("mid-stream disconnects injected", degraded_cuts > 0))
+    print()
+    for name, passed in checks:
+        print(f"{'✅' if passed else '❌'} {name}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({
+                "phases": phases,
+                "fallback_overhead_p95": overhead,
+                "recovery_seconds": recovery if recovery != float("inf") else None,
+                "providers": {"groq": groq.counts_snapshot(), "gemini": gemini.counts_snapshot()},
+                "degraded_streams": degraded_streams,
+                "degraded_stream_disconnects": degraded_cuts,
+                "slo": {name: passed for name, passed in checks},
+            }, f, indent=2)
+
+    return 0 if all(passed for _, passed in checks) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
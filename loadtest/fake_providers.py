@@ -0,0 +1,326 @@
+"""
+Local stand-ins for the Groq (OpenAI-compatible) and Gemini (REST) APIs with
+fault injection: latency, 429s, 5xx and mid-stream disconnects, each at a
+configurable rate. Faults can be changed while the servers run, either in
+process (`server.faults.update(...)`) or over HTTP:
+
+    curl -X POST localhost:9001/_faults -d '{"rate_429": 0.5}'
+
+Usage:
+    python -m loadtest.fake_providers --groq-port 9001 --gemini-port 9002
+    python -m loadtest.fake_providers --groq-5xx 0.3 --groq-latency 2
+"""
+import abc
+import argparse
+import json
+import random
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = (
+    "According to the Vachanamrut, a devotee overcomes maya by firm conviction in God, "
+    "by observing dharma and by keeping the company of the Satpurush. "
+) * 3
+
+
+class Faults:
+    """Fault rates (0..1) and delays (seconds) for one provider; thread-safe snapshot/update."""
+
+    FIELDS = {
+        "latency": 0.05,        # before the response starts
+        "jitter": 0.05,         # uniform extra latency
+        "token_delay": 0.01,    # between streamed chunks
+        "rate_429": 0.0,
+        "rate_5xx": 0.0,
+        "rate_disconnect": 0.0, # close the connection part-way through the body
+        "retry_after": 1.0,     # Retry-After header on 429s
+    }
+
+    def __init__(self, **overrides):
+        self._lock = threading.Lock()
+        self._values = dict(self.FIELDS)
+        self.update(**overrides)
+        self._healthy = dict(self._values)
+
+    def update(self, **values):
+        unknown = set(values) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fault settings: {sorted(unknown)}")
+        with self._lock:
+            self._values.update({k: float(v) for k, v in values.items()})
+
+    def heal(self):
+        """Restores the settings the provider started with."""
+        with self._lock:
+            self._values = dict(self._healthy)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler, metaclass=abc.ABCMeta):
+    protocol_version = "HTTP/1.1" # Chunked bodies, so a dropped connection is a visible protocol error
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _disconnect(self):
+        # Drop the connection without the terminating chunk
+        self.close_connection = True
+        try:
+            self.wfile.flush()
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        payload = json.loads(body or b"{}")
+
+        if self.path == "/_faults":
+            try:
+                self.server.faults.update(**payload)
+            except ValueError as e:
+                return self._send_json(400, {"error": str(e)})
+            return self._send_json(200, self.server.faults.snapshot())
+
+        faults = self.server.faults.snapshot()
+        stream = self.is_stream(payload)
+        self.server.count("requests")
+        if stream:
+            self.server.count("stream_requests")
+        time.sleep(faults["latency"] + random.uniform(0, faults["jitter"]))
+
+        roll = random.random()
+        if roll < faults["rate_429"]:
+            self.server.count("429")
+            return self._send_json(429, {"error": {"message": "Rate limit reached (injected)", "code": 429}},
+                                   headers={"Retry-After": f"{faults['retry_after']:g}"})
+        if roll < faults["rate_429"] + faults["rate_5xx"]:
+            self.server.count("5xx")
+            return self._send_json(random.choice([500, 502, 503]), {"error": {"message": "Upstream failure (injected)"}})
+
+        disconnect = random.random() < faults["rate_disconnect"]
+        if disconnect:
+            self.server.count("stream_disconnect" if stream else "disconnect")
+        self.respond(payload, disconnect, faults["token_delay"])
+
+    def do_GET(self):
+        if self.path == "/_faults":
+            return self._send_json(200, self.server.faults.snapshot())
+        self._send_json(404, {"error": {"message": "Not found"}})
+
+    @abc.abstractmethod
+    def is_stream(self, payload):
+        """Whether the request asks for a streamed response."""
+
+    @abc.abstractmethod
+    def respond(self, payload, disconnect, token_delay):
+        """Writes the provider's response, cutting the body short when `disconnect` is set."""
+
+
+def _answer_for(system: str, user: str):
+    # Recognizes the pipeline step from its system prompt; JSON-mode steps get valid JSON
+    if '"language"' in system:
+        return json.dumps({"language": "en"})
+    if '"ranked_indices"' in system:
+        return json.dumps({"ranked_indices": [0, 1, 2]})
+    if '"chapter"' in system:
+        return "{}"
+    # Rewrite / translate echo the question, so distinct questions keep distinct
+    # search queries (and answer-cache keys) instead of collapsing into one
+    for step, marker in (("query rewriting", "Original Question (English):"), ("Translate the user's text", "Text:")):
+        if step in system and marker in user:
+            return user.split(marker, 1)[1].strip()
+    return ANSWER
+
+
+def _pieces(text: str):
+    return re.findall(r"\S+\s*", text)
+
+
+class GroqHandler(FakeProviderHandler):
+    """POST /openai/v1/chat/completions (stream and non-stream)."""
+
+    def is_stream(self, payload):
+        return bool(payload.get("stream"))
+
+    def respond(self, payload, disconnect, token_delay):
+        if not self.path.startswith("/openai/v1/chat/completions"):
+            return self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        messages = payload.get("messages", [])
+        system = "\n".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+        user = next((str(m.get("content", "")) for m in reversed(messages) if m.get("role") == "user"), "")
+        text = _answer_for(system, user)
+        model = payload.get("model", "fake")
+        base = {"id": f"chatcmpl-{random.getrandbits(32):x}", "created": int(time.time()), "model": model}
+        usage = {"prompt_tokens": 100, "completion_tokens": len(_pieces(text)), "total_tokens": 100 + len(_pieces(text))}
+
+        if not payload.get("stream"):
+            body = dict(base, object="chat.completion", usage=usage, choices=[
+                {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+            ])
+            if disconnect:
+                data = json.dumps(body).encode("utf-8")
+                self._start_chunked("application/json")
+                self._write_chunk(data[:len(data) // 2])
+                return self._disconnect()
+            return self._send_json(200, body)
+
+        self._start_chunked("text/event-stream")
+        pieces = _pieces(text)
+        cut = random.randint(1, max(1, len(pieces) - 1)) if disconnect else None
+        for i, piece in enumerate(pieces):
+            if i == cut:
+                return self._disconnect()
+            chunk = dict(base, object="chat.completion.chunk", choices=[
+                {"index": 0, "delta": {"content": piece}, "finish_reason": None}
+            ])
+            self._write_chunk(b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n")
+            time.sleep(token_delay)
+        # Like Groq, report usage on a final chunk under x_groq
+        chunk = dict(base, object="chat.completion.chunk", x_groq={"usage": usage}, choices=[
+            {"index": 0, "delta": {}, "finish_reason": "stop"}
+        ])
+        self._write_chunk(b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n")
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+
+class GeminiHandler(FakeProviderHandler):
+    """POST /v1beta/models/<model>:generateContent and :streamGenerateContent (REST transport)."""
+
+    def is_stream(self, payload):
+        return self.path.split("?")[0].endswith(":streamGenerateContent")
+
+    def respond(self, payload, disconnect, token_delay):
+        path = self.path.split("?")[0]
+        if not path.startswith("/v1beta/models/") or not path.endswith(("generateContent", "GenerateContent")):
+            return self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        def text_of(content):
+            return "\n".join(part.get("text", "") for part in (content or {}).get("parts", []))
+
+        contents = payload.get("contents", [])
+        text = _answer_for(text_of(payload.get("systemInstruction")), text_of(contents[-1]) if contents else "")
+        pieces = _pieces(text)
+
+        def candidate(part_text, finished):
+            body = {"candidates": [{"content": {"parts": [{"text": part_text}], "role": "model"}, "index": 0}]}
+            if finished:
+                body["candidates"][0]["finishReason"] = "STOP"
+                body["usageMetadata"] = {"promptTokenCount": 100, "candidatesTokenCount": len(pieces), "totalTokenCount": 100 + len(pieces)}
+            return body
+
+        if not path.endswith(":streamGenerateContent"):
+            if disconnect:
+                data = json.dumps(candidate(text, True)).encode("utf-8")
+                self._start_chunked("application/json")
+                self._write_chunk(data[:len(data) // 2])
+                return self._disconnect()
+            return self._send_json(200, candidate(text, True))
+
+        # The REST transport streams one JSON array of responses
+        self._start_chunked("application/json")
+        cut = random.randint(1, max(1, len(pieces) - 1)) if disconnect else None
+        self._write_chunk(b"[")
+        for i, piece in enumerate(pieces):
+            if i == cut:
+                return self._disconnect()
+            data = json.dumps(candidate(piece, i == len(pieces) - 1)).encode("utf-8")
+            self._write_chunk((b"," if i else b"") + data)
+            time.sleep(token_delay)
+        self._write_chunk(b"]")
+        self._write_chunk(b"")
+
+
+class FakeProviderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, name, port, handler, faults=None):
+        super().__init__(("127.0.0.1", port), handler)
+        self.name = name
+        self.faults = faults or Faults()
+        self.counts = {}
+        self._counts_lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, what):
+        with self._counts_lock:
+            self.counts[what] = self.counts.get(what, 0) + 1
+
+    def counts_snapshot(self):
+        with self._counts_lock:
+            return dict(self.counts)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name=f"fake-{self.name}", daemon=True).start()
+        return self
+
+
+def start_fake_providers(groq_port=0, gemini_port=0, groq_faults=None, gemini_faults=None):
+    """Starts both stand-ins on background threads (port 0 = any free port)."""
+    groq = FakeProviderServer("groq", groq_port, GroqHandler, groq_faults).start()
+    gemini = FakeProviderServer("gemini", gemini_port, GeminiHandler, gemini_faults).start()
+    return groq, gemini
+
+
+def add_fault_args(parser, provider):
+    for field, default in Faults.FIELDS.items():
+        flag = field.replace("rate_", "").replace("_", "-")
+        parser.add_argument(f"--{provider}-{flag}", dest=f"{provider}_{field}", type=float, default=default)
+
+
+def faults_from_args(args, provider):
+    return Faults(**{field: getattr(args, f"{provider}_{field}") for field in Faults.FIELDS})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run fault-injecting Groq / Gemini stand-ins")
+    parser.add_argument("--groq-port", type=int, default=9001)
+    parser.add_argument("--gemini-port", type=int, default=9002)
+    add_fault_args(parser, "groq")
+    add_fault_args(parser, "gemini")
+    args = parser.parse_args()
+
+    groq, gemini = start_fake_providers(args.groq_port, args.gemini_port,
+                                        faults_from_args(args, "groq"), faults_from_args(args, "gemini"))
+    print(f"Groq stand-in:   GROQ_BASE_URL={groq.url}")
+    print(f"Gemini stand-in: GEMINI_API_ENDPOINT={gemini.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Offline check that Gemini calls are served through the cached system prefix.
+
+Swaps the `genai` module used by LLMService for a recording fake (no network,
+no keys), pins GEMINI_MODEL and lowers GEMINI_CACHE_MIN_TOKENS so the real
+prompts qualify, and runs the fallback chain with provider="gemini". It verifies that:
+- each distinct system prefix creates exactly one CachedContent,
+- the cache is created for the same model id that normal calls use,
+- every call is answered by a model bound to that cache (no inline prefix),
+- an unversioned model alias never creates a cache,
+- a streamed answer records the provider-reported usage from its last chunk.
+
+Usage:
+    python -m loadtest.prefix_cache_check
+"""
+import asyncio
+import sys
+
+from app.agent import prompts
+from app.core.settings import settings
+from app.services import llm_service as llm_module
+
+
+class FakeGenAI:
+    """Records what LLMService asks of google.generativeai."""
+
+    def __init__(self):
+        self.created = []   # models CachedContent.create was called with
+        self.calls = []     # ("cached", cache name) or ("inline", model name) per generate_content
+        fake = self
+
+        class CachedContent:
+            def __init__(self, name, model):
+                self.name = name
+                self.model = model
+
+            @classmethod
+            def create(cls, model, system_instruction, ttl):
+                fake.created.append(model)
+                return cls(f"cachedContents/{len(fake.created)}", model)
+
+        class GenerativeModel:
+            def __init__(self, model_name, system_instruction=None, cached_content=None):
+                self.model_name = model_name
+                self.cached_content = cached_content
+
+            @classmethod
+            def from_cached_content(cls, cached_content):
+                return cls(cached_content.model, cached_content=cached_content)
+
+            def generate_content(self, contents, stream=False, generation_config=None, request_options=None):
+                if self.cached_content is not None:
+                    fake.calls.append(("cached", self.cached_content.name))
+                else:
+                    fake.calls.append(("inline", self.model_name))
+                if stream:
+                    usage = llm_module.SimpleNamespace(prompt_token_count=120, candidates_token_count=2,
+                                                       cached_content_token_count=100)
+                    return [llm_module.SimpleNamespace(text="Maya ", usage_metadata=None),
+                            llm_module.SimpleNamespace(text="is...", usage_metadata=usage)]
+                return llm_module.SimpleNamespace(text="{}", usage_metadata=None)
+
+        self.GenerativeModel = GenerativeModel
+        self.caching = llm_module.SimpleNamespace(CachedContent=CachedContent)
+        self.types = llm_module.SimpleNamespace(GenerationConfig=lambda **kwargs: kwargs)
+
+    def configure(self, **kwargs):
+        pass
+
+
+async def run(service):
+    final = prompts.build_messages("final_answer", context_text="...", query="What is maya?", language="en")
+    rerank = prompts.build_messages("rerank_passages", rewritten_query="maya", numbered="[0] ...")
+    for messages in (final, final, rerank, final):
+        await service.generate_response(messages, provider="gemini", template="check")
+    stream = await service.generate_response(final, stream=True, provider="gemini", template="final_answer")
+    async for _ in service.iterate_stream(stream):
+        pass
+
+
+def main():
+    fake = FakeGenAI()
+    llm_module.genai = fake
+    settings.GEMINI_CONTEXT_CACHE = True
+    settings.GEMINI_CACHE_MIN_TOKENS = 1
+
+    # Unversioned alias (the default): caching must stay off
+    settings.GEMINI_MODEL = "gemini-1.5-flash"
+    service = llm_module.LLMService()
+    service.gemini_clients = ["fake-key"]
+    asyncio.run(run(service))
+    alias_created, alias_calls = list(fake.created), list(fake.calls)
+    fake.created.clear()
+    fake.calls.clear()
+
+    settings.GEMINI_MODEL = "gemini-1.5-flash-001"
+    service = llm_module.LLMService()
+    service.gemini_clients = ["fake-key"]
+    asyncio.run(run(service))
+
+    expected_model = f"models/{settings.GEMINI_MODEL}"
+    streamed = service.usage_report()["templates"]["final_answer"]
+    checks = [
+        ("alias model created no cache", not alias_created and all(kind == "inline" for kind, _ in alias_calls)),
+        ("one cache per distinct prefix", len(fake.created) == 2),
+        (f"caches created for {expected_model}", all(model == expected_model for model in fake.created)),
+        ("every call used the cached prefix", all(kind == "cached" for kind, _ in fake.calls)),
+        ("repeated prefix reused its cache", fake.calls[0] == fake.calls[1] == fake.calls[3] == fake.calls[4]),
+        ("streamed answer recorded its usage", (streamed["prompt_tokens"], streamed["cached_tokens"]) == (120, 100)),
+    ]
+    print(f"Caches created: {fake.created}")
+    print(f"Calls: {fake.calls}")
+    for name, passed in checks:
+        print(f"{'✅' if passed else '❌'} {name}")
+    return 0 if all(passed for _, passed in checks) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
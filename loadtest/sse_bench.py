@@ -0,0 +1,116 @@
+"""
+CPU cost of the /ask SSE layer (app/core/sse.event_stream) per stream.
+
+Runs N concurrent streams in one event loop, each fed by a stub source that
+emits the usual session / thought / citation chunks and then answer tokens at
+a fixed interval (no LLM, no network, no HTTP). Reports process CPU time per
+stream and frames per stream for:
+- legacy:    the original main.event_generator (json.dumps + one frame per chunk)
+- coalesced: event_stream with token coalescing as configured
+- per-token: event_stream with one frame per token
+A run that only drains the stub sources is the baseline; "sse ms" is the CPU
+per stream on top of it, i.e. the cost of the framing layer itself.
+
+Usage:
+    python -m loadtest.sse_bench
+    python -m loadtest.sse_bench --streams 500 --tokens 400 --token-interval 0.01
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from app.core.sse import event_stream
+from app.core.settings import settings
+
+
+async def stub_source(tokens: int, interval: float):
+    yield {"type": "session", "data": {"conversation_id": "bench"}}
+    yield {"type": "thought", "data": "🧠 Analyzing your question..."}
+    yield {"type": "citation", "data": [{"text": "..." * 30, "metadata": {"chapter": "Gadhada", "section": "I", "vachanamrut_no": 1}}]}
+    for i in range(tokens):
+        yield {"type": "token", "data": f" word{i % 50}"}
+        await asyncio.sleep(interval)
+
+
+async def not_disconnected():
+    return False
+
+
+async def drain(tokens, interval, flush_interval, max_frame_chars):
+    async for _ in stub_source(tokens, interval):
+        pass
+    return 0, 0
+
+
+async def legacy(tokens, interval, flush_interval, max_frame_chars):
+    async def event_generator():
+        async for chunk in stub_source(tokens, interval):
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    frames = size = 0
+    async for data in event_generator():
+        frames += 1
+        size += len(data.encode("utf-8"))
+    return frames, size
+
+
+async def consume(tokens, interval, flush_interval, max_frame_chars):
+    frames = size = 0
+    stream = event_stream(stub_source(tokens, interval), not_disconnected,
+                          flush_interval=flush_interval, max_frame_chars=max_frame_chars)
+    async for data in stream:
+        frames += 1
+        size += len(data)
+    return frames, size
+
+
+async def run(reader, streams, tokens, interval, flush_interval, max_frame_chars):
+    cpu, wall = time.process_time(), time.perf_counter()
+    results = await asyncio.gather(*(
+        reader(tokens, interval, flush_interval, max_frame_chars) for _ in range(streams)
+    ))
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    frames = sum(f for f, _ in results)
+    return {
+        "cpu_ms_per_stream": 1000 * cpu / streams,
+        "cpu_utilization": cpu / wall,
+        "frames_per_stream": frames / streams,
+        "kb_per_stream": sum(s for _, s in results) / streams / 1024,
+        "wall_s": wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CPU per SSE stream at high concurrency")
+    parser.add_argument("--streams", type=int, default=500)
+    parser.add_argument("--tokens", type=int, default=300, help="Answer tokens per stream")
+    parser.add_argument("--token-interval", type=float, default=0.02, help="Seconds between tokens")
+    args = parser.parse_args()
+
+    variants = {
+        "baseline": (drain, 0.0, 1),
+        "legacy": (legacy, 0.0, 1),
+        "coalesced": (consume, settings.SSE_FLUSH_INTERVAL, settings.SSE_MAX_FRAME_CHARS),
+        "per-token": (consume, 0.0, 1),
+    }
+    print(f"{args.streams} concurrent streams x {args.tokens} tokens every {args.token_interval * 1000:g} ms\n")
+    print(f"{'variant':<11}{'cpu ms':>9}{'sse ms':>9}{'cpu util':>10}{'frames':>9}{'KB':>8}{'wall s':>8}  (per stream)")
+    baseline = None
+    saturated = False
+    for name, (reader, flush_interval, max_frame_chars) in variants.items():
+        r = asyncio.run(run(reader, args.streams, args.tokens, args.token_interval, flush_interval, max_frame_chars))
+        if baseline is None:
+            baseline = r["cpu_ms_per_stream"]
+        saturated = saturated or r["cpu_utilization"] > 0.9
+        print(f"{name:<11}{r['cpu_ms_per_stream']:>9.2f}{r['cpu_ms_per_stream'] - baseline:>9.2f}{r['cpu_utilization']:>10.0%}"
+              f"{r['frames_per_stream']:>9.1f}{r['kb_per_stream']:>8.1f}{r['wall_s']:>8.1f}")
+    if saturated:
+        print("\n⚠️ The loop was CPU-bound; raise --token-interval or lower --streams for stable numbers.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
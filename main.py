@@ -1,16 +1,30 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
-import json
-import asyncio
+from starlette.background import BackgroundTask
+from contextlib import asynccontextmanager
 
 # Import our Clean Modules
 from app.models.schemas import QueryRequest, AIResponse, Citation
-from app.services.librarian import librarian_service
+from app.services.graph import service_graph
 # New Agent Orchestrator
 from app.agent.orchestrator import process_user_query_stream
+from app.core.sse import event_stream
+from app.core import profiling
+from app.agent.steps import is_follow_up, is_summary_request
+from app.core.settings import settings
+from app.services.summary_store import LANGUAGES
+from app.services import retrieval_plan
+from app.services.retrieval_plan import filter_equalities
+from app.services.admission import admission_controller, Rejected, PRIORITY_SHORT, PRIORITY_PIPELINE
 
-app = FastAPI(title="Vachanamrut AI API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the shared service graph (LLM clients, embeddings, index, corpus) once
+    service_graph.warm_up()
+    yield
+
+app = FastAPI(title="Vachanamrut AI API", lifespan=lifespan)
 
 origins = [
     "http://localhost:5173",  
@@ -18,6 +32,8 @@ origins = [
     "*"
 ]
 
+app.add_middleware(profiling.ProfilingMiddleware, paths=("/ask", "/vachanamrut"))
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -30,20 +46,39 @@ app.add_middleware(
 def health_check():
     return {"status": "ok", "modules": ["Agent", "Librarian", "VectorDB"]}
 
+@app.get("/metrics")
+def metrics():
+    return {
+        "prompts": service_graph.llm.usage_report(),
+        "answer_cache": service_graph.answers.report(),
+        "translation": service_graph.translator.report(),
+        "admission": admission_controller.report()
+    }
+
+@app.get("/debug/profiles")
+def slowest_requests(http_request: Request, limit: int = Query(20, description="Number of requests")):
+    # Slowest recent /ask and /vachanamrut requests with their stage breakdown (needs X-Profile-Token)
+    if not profiling.authorized(dict(http_request.headers.raw)):
+        raise HTTPException(status_code=403, detail="Profiling token required.")
+    return {"requests": profiling.profiler.slowest(limit)}
+
 @app.get("/vachanamrut")
 def get_vachanamrut(
     chapter: str = Query(..., description="Chapter Name"),
     number: int = Query(..., description="Number"),
     section: str = Query("", description="Section (Optional)")
 ):
-    result = librarian_service.get_full_text(chapter, section, number)
+    profiling.since_start("parse_validate")
+    with profiling.stage("librarian_lookup"):
+        result = service_graph.corpus.get_full_text(chapter, section, number)
     if not result:
         raise HTTPException(status_code=404, detail="Vachanamrut not found")
     return result
 
 # --- AGENT STREAMING ENDPOINT ---
 @app.post("/ask")
-async def ask_ai(request: QueryRequest):
+async def ask_ai(request: QueryRequest, http_request: Request):
+    profiling.since_start("parse_validate")
     
     # A. Check for Manual Filters (Sidebar)
     conditions = []
@@ -55,26 +90,66 @@ async def ask_ai(request: QueryRequest):
     if len(conditions) == 1: manual_clause = conditions[0]
     elif len(conditions) > 1: manual_clause = {"$and": conditions}
 
-    # Generator for Streaming
-    async def event_generator():
+    # B. Admission Control (short requests jump the queue; overload is shed)
+    short = is_short_request(request, manual_clause)
+    try:
+        with profiling.stage("admission_wait"):
+            ticket = await admission_controller.acquire(
+                client_id=client_id(http_request),
+                priority=PRIORITY_SHORT if short else PRIORITY_PIPELINE
+            )
+    except Rejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=f"Server busy ({e.reason}). Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    # Generator for Streaming (coalesced frames, heartbeats, cancel on disconnect)
+    chunks = process_user_query_stream(
+        user_query=request.question,
+        chat_history=request.history,
+        manual_filters=manual_clause,
+        conversation_id=request.conversation_id
+    )
+
+    async def frames():
         try:
-            # Use the new modular orchestrator
-            async for chunk in process_user_query_stream(
-                user_query=request.question,
-                chat_history=request.history,
-                manual_filters=manual_clause
-            ):
-                # Format: "data: {JSON}\n\n"
-                yield f"data: {json.dumps(chunk)}\n\n"
-                
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
-        
-        yield "data: [DONE]\n\n"
-
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+            async for data in event_stream(chunks, http_request.is_disconnected):
+                yield data
+        finally:
+            ticket.release()
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also release if the body is never iterated (client gone before streaming)
+        background=BackgroundTask(ticket.release)
+    )
+
+def is_short_request(request: QueryRequest, manual_clause):
+    """Requests that skip most LLM calls: a follow-up in an existing session, or a precomputed summary."""
+    if request.conversation_id and not manual_clause and is_follow_up(request.question):
+        session = service_graph.sessions.get(request.conversation_id)
+        if session and session["passages"]["documents"]:
+            return True
+    if is_summary_request(request.question) and retrieval_plan.plan(manual_clause) == "direct":
+        fields = filter_equalities(manual_clause)
+        discourse = service_graph.corpus.get_full_text(fields["chapter"], fields.get("section", ""), fields["vachanamrut_no"])
+        return bool(discourse) and any(service_graph.summaries.get(discourse, lang) for lang in LANGUAGES)
+    return False
+
+def client_id(http_request: Request):
+    # X-Forwarded-For is only trusted when the direct peer is one of our own proxies
+    peer = http_request.client.host if http_request.client else "unknown"
+    forwarded = http_request.headers.get("x-forwarded-for")
+    if forwarded and peer in settings.TRUSTED_PROXIES:
+        # Rightmost address that was not added by a trusted proxy
+        for address in reversed([a.strip() for a in forwarded.split(",")]):
+            if address and address not in settings.TRUSTED_PROXIES:
+                return address
+    return peer
 
 if __name__ == "__main__":
     import uvicorn